@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import QueuedEmail
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "subject",
+        "recipients",
+        "status",
+        "attempts",
+        "created_at",
+        "sent_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("subject", "recipients")
+    readonly_fields = ("message", "last_error")
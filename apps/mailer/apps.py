@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class MailerConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.mailer"
+
+    def ready(self):
+        from .email import precompile_templates
+
+        precompile_templates()
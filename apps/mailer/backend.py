@@ -0,0 +1,28 @@
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Email backend saving messages to QueuedEmail instead of sending them,
+    the request only pays one INSERT \n
+    manage.py send_mail_queue delivers them through MAILER_DELIVERY_BACKEND
+    """
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        now = timezone.now()
+        queued = []
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            try:
+                queued.append(QueuedEmail.from_message(message, now))
+            except ValueError:
+                if not self.fail_silently:
+                    raise
+        QueuedEmail.objects.bulk_create(queued)
+        return len(queued)
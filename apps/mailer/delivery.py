@@ -0,0 +1,129 @@
+import datetime
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+
+class MailServerUnavailable(Exception):
+    """
+    No connection to the mail server could be opened, the claimed batch was
+    put back without using one of its attempts
+    """
+
+
+def get_retry_delay(attempts):
+    # exponential backoff, MAILER_RETRY_DELAY then twice as long each time
+    return datetime.timedelta(seconds=settings.MAILER_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_batch(batch_size, now):
+    """
+    Mark up to batch_size due messages as sending for this run and return
+    them \n
+    the conditional UPDATE only takes rows still due, so concurrent workers
+    never get the same message, a claim left by a crashed worker is due again
+    after MAILER_CLAIM_TIMEOUT seconds
+    """
+    due = Q(status__in=("queued", "sending"), next_attempt_at__lte=now)
+    candidates = list(
+        QueuedEmail.objects.filter(due)
+        .order_by("next_attempt_at")
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    if not candidates:
+        return []
+    claim = uuid.uuid4()
+    QueuedEmail.objects.filter(due, pk__in=candidates).update(
+        status="sending",
+        claimed_by=claim,
+        next_attempt_at=now + datetime.timedelta(seconds=settings.MAILER_CLAIM_TIMEOUT),
+    )
+    return list(
+        QueuedEmail.objects.filter(claimed_by=claim, status="sending").order_by(
+            "created_at"
+        )
+    )
+
+
+def record_failure(queued, exc, max_attempts, now):
+    queued.attempts += 1
+    queued.last_error = f"{type(exc).__name__}: {exc}"
+    if queued.attempts >= max_attempts:
+        queued.status = "failed"
+    else:
+        queued.status = "queued"
+        queued.next_attempt_at = now + get_retry_delay(queued.attempts)
+
+
+def defer(queued, exc, now):
+    # the server was unreachable, not the message's fault: no attempt is used
+    queued.last_error = f"{type(exc).__name__}: {exc}"
+    queued.status = "queued"
+    queued.next_attempt_at = now + get_retry_delay(1)
+
+
+def send_queued(batch_size=None, max_attempts=None):
+    """
+    Claim one batch of due queued messages and deliver it over a single
+    connection of MAILER_DELIVERY_BACKEND \n
+    failed messages are retried with backoff up to max_attempts times,
+    returns (sent, failed) counts, raises MailServerUnavailable when the
+    connection could not be opened, the rest of the batch waits for the
+    server without using attempts
+    """
+    batch_size = batch_size or settings.MAILER_BATCH_SIZE
+    max_attempts = max_attempts or settings.MAILER_MAX_ATTEMPTS
+    now = timezone.now()
+    batch = claim_batch(batch_size, now)
+    if not batch:
+        return 0, 0
+
+    sent, failed = [], []
+    connection = get_connection(settings.MAILER_DELIVERY_BACKEND)
+    try:
+        try:
+            connection.open()
+        except Exception as exc:
+            logger.warning("Could not connect to the mail server: %s", exc)
+            for queued in batch:
+                defer(queued, exc, now)
+            failed = batch
+            raise MailServerUnavailable(str(exc)) from exc
+        for index, queued in enumerate(batch):
+            try:
+                connection.send_messages([queued.to_message(connection)])
+            except Exception as exc:
+                logger.warning("Could not send queued email %s: %s", queued.pk, exc)
+                # the server may have dropped us, reconnect once for the rest
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as open_exc:
+                    logger.warning(
+                        "Could not reconnect to the mail server: %s", open_exc
+                    )
+                    for queued in batch[index:]:
+                        defer(queued, open_exc, now)
+                    failed.extend(batch[index:])
+                    raise MailServerUnavailable(str(open_exc)) from open_exc
+                record_failure(queued, exc, max_attempts, now)
+                failed.append(queued)
+            else:
+                queued.status = "sent"
+                queued.sent_at = timezone.now()
+                sent.append(queued)
+    finally:
+        connection.close()
+        QueuedEmail.objects.bulk_update(sent, ["status", "sent_at"])
+        QueuedEmail.objects.bulk_update(
+            failed, ["status", "attempts", "last_error", "next_attempt_at"]
+        )
+    return len(sent), len(failed)
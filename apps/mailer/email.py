@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.template.context import make_context
+from django.template.loader import get_template
+
+from djoser import email
+
+# template blocks of transactional emails and the message attributes they fill
+EMAIL_BLOCKS = {"subject": "subject", "text_body": "body", "html_body": "html"}
+
+_blocks = {}
+
+
+def get_email_template(template_name):
+    """
+    Return the template and its (attribute, block) pairs \n
+    the template comes parsed from the cached loader, its blocks are looked up
+    once per parse so autoreload still picks up edited files
+    """
+    template = get_template(template_name)
+    compiled, blocks = _blocks.get(template_name, (None, None))
+    if compiled is not template.template:
+        blocks = [
+            (EMAIL_BLOCKS[node.name], node)
+            for node in template.template.nodelist
+            if getattr(node, "name", None) in EMAIL_BLOCKS
+        ]
+        _blocks[template_name] = (template.template, blocks)
+    return template, blocks
+
+
+def precompile_templates():
+    """
+    Parse every email template into the cached loader, called at startup
+    """
+    names = list(settings.DJOSER["TEMPLATES"].values())
+    names += settings.MAILER_PRECOMPILED_TEMPLATES
+    for template_name in names:
+        get_email_template(template_name)
+
+
+class PrecompiledEmailMixin:
+    """
+    Render subject, text and html bodies of a templated_mail message from the
+    precompiled blocks, binding the context once
+    """
+
+    def render(self):
+        template, blocks = get_email_template(self.template_name)
+        context = make_context(self.get_context_data(), request=self.request)
+        with context.bind_template(template.template):
+            for attr, node in blocks:
+                setattr(self, attr, node.render(context).strip())
+        self._attach_body()
+
+
+class ActivationEmail(PrecompiledEmailMixin, email.ActivationEmail):
+    template_name = settings.DJOSER["TEMPLATES"]["activation"]
+
+
+class ConfirmationEmail(PrecompiledEmailMixin, email.ConfirmationEmail):
+    template_name = settings.DJOSER["TEMPLATES"]["confirmation"]
+
+
+class PasswordResetEmail(PrecompiledEmailMixin, email.PasswordResetEmail):
+    template_name = settings.DJOSER["TEMPLATES"]["password_reset"]
+
+
+class PasswordChangedConfirmationEmail(
+    PrecompiledEmailMixin, email.PasswordChangedConfirmationEmail
+):
+    template_name = settings.DJOSER["TEMPLATES"]["password_changed_confirmation"]
+
+
+class UsernameChangedConfirmationEmail(
+    PrecompiledEmailMixin, email.UsernameChangedConfirmationEmail
+):
+    template_name = settings.DJOSER["TEMPLATES"]["username_changed_confirmation"]
+
+
+class UsernameResetEmail(PrecompiledEmailMixin, email.UsernameResetEmail):
+    template_name = settings.DJOSER["TEMPLATES"]["username_reset"]
@@ -0,0 +1,75 @@
+import json
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine, engines
+
+from apps.mailer.email import PasswordResetEmail, get_email_template
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure renders per second of the password_reset email and the "
+        "newsletter welcome template, from the precompiled templates and "
+        "re-parsing them on every render as an uncached loader does"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--renders", type=int, default=2000)
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        renders = options["renders"]
+        user = get_user_model()(
+            id=uuid.uuid4(), email="bench@example.com", username="bench"
+        )
+        engine = engines["django"].engine
+        uncached = Engine(
+            dirs=engine.dirs,
+            libraries=engine.libraries,
+            loaders=[
+                "django.template.loaders.filesystem.Loader",
+                "django.template.loaders.app_directories.Loader",
+            ],
+        )
+
+        def password_reset():
+            PasswordResetEmail(context={"user": user}).render()
+
+        def password_reset_uncached():
+            message = PasswordResetEmail(context={"user": user})
+            template = uncached.get_template(message.template_name)
+            context = Context(message.get_context_data())
+            with context.bind_template(template):
+                for node in template.nodelist:
+                    message._process_node(node, context)
+
+        welcome_context = {"newsletter": {"email": "bench@example.com"}}
+        welcome_name = "email/newsletter/welcome.html"
+
+        def welcome():
+            get_email_template(welcome_name)[0].render(welcome_context)
+
+        def welcome_uncached():
+            template = uncached.get_template(welcome_name)
+            template.render(Context(welcome_context))
+
+        results = {}
+        for name, render in [
+            ("password_reset", password_reset),
+            ("password_reset_uncached", password_reset_uncached),
+            ("welcome", welcome),
+            ("welcome_uncached", welcome_uncached),
+        ]:
+            start = time.perf_counter()
+            for _index in range(renders):
+                render()
+            results[name] = round(renders / (time.perf_counter() - start), 1)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results))
+            return
+        for name, value in results.items():
+            self.stdout.write(f"{name:>24}: {value} renders/s")
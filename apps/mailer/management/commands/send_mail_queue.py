@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.mailer.delivery import MailServerUnavailable, send_queued
+
+# longest wait between polls of --loop while the mail server is unreachable
+MAX_BACKOFF = 300
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver messages queued by QueuedEmailBackend in batches over one "
+        "connection, retrying failures with backoff. Run once from cron or "
+        "keep it running with --loop, several workers can run at once"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--max-attempts", type=int)
+        parser.add_argument(
+            "--loop", action="store_true", help="keep polling the queue"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="seconds between polls of --loop",
+        )
+
+    def handle(self, *args, **options):
+        unavailable = 0
+        while True:
+            try:
+                sent, failed = send_queued(
+                    options["batch_size"], options["max_attempts"]
+                )
+            except MailServerUnavailable as exc:
+                if not options["loop"]:
+                    raise CommandError(f"Mail server unavailable: {exc}")
+                unavailable += 1
+                delay = min(options["interval"] * 2**unavailable, MAX_BACKOFF)
+                self.stderr.write(
+                    f"Mail server unavailable: {exc}, retrying in {delay:.0f}s"
+                )
+                time.sleep(delay)
+                continue
+            unavailable = 0
+            if sent or failed:
+                self.stdout.write(f"sent {sent}, failed {failed}")
+                # drain the queue before waiting
+                continue
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
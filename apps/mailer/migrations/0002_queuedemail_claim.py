@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailer", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="queuedemail",
+            name="claimed_by",
+            field=models.UUIDField(blank=True, null=True, verbose_name="Claimed by"),
+        ),
+        migrations.AlterField(
+            model_name="queuedemail",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("sending", "Sending"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                ],
+                default="queued",
+                max_length=10,
+                verbose_name="Status",
+            ),
+        ),
+    ]
@@ -0,0 +1,94 @@
+import base64
+import uuid
+
+from django.core.mail import EmailMultiAlternatives
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class QueuedEmail(models.Model):
+    """
+    Message saved by QueuedEmailBackend, delivered later by send_mail_queue
+    """
+
+    CHOISE_STATUS = (
+        ("queued", "Queued"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    )
+
+    id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True)
+    subject = models.TextField(verbose_name=_("Subject"))
+    recipients = models.TextField(verbose_name=_("Recipients"))
+    # EmailMessage fields as json, see from_message
+    message = models.JSONField(verbose_name=_("Message"))
+    status = models.CharField(
+        max_length=10, choices=CHOISE_STATUS, default="queued", verbose_name=_("Status")
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    next_attempt_at = models.DateTimeField(verbose_name=_("Next attempt at"))
+    last_error = models.TextField(blank=True, verbose_name=_("Last error"))
+    # worker run that claimed the message, see delivery.claim_batch
+    claimed_by = models.UUIDField(blank=True, null=True, verbose_name=_("Claimed by"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created at"))
+    sent_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Sent at"))
+
+    class Meta:
+        # the worker picks due queued messages in order
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="mailer_due_idx"),
+        ]
+
+    def __str__(self):
+        return self.subject
+
+    @classmethod
+    def from_message(cls, message, next_attempt_at):
+        attachments = []
+        for attachment in message.attachments:
+            if not isinstance(attachment, tuple):
+                raise ValueError(
+                    "Only (filename, content, mimetype) attachments can be queued"
+                )
+            filename, content, mimetype = attachment
+            if isinstance(content, str):
+                content = content.encode()
+            attachments.append(
+                [filename, base64.b64encode(content).decode("ascii"), mimetype]
+            )
+        return cls(
+            subject=message.subject,
+            recipients=", ".join(message.recipients()),
+            message={
+                "subject": message.subject,
+                "body": message.body,
+                "from_email": message.from_email,
+                "to": message.to,
+                "cc": message.cc,
+                "bcc": message.bcc,
+                "reply_to": message.reply_to,
+                "headers": message.extra_headers,
+                "content_subtype": message.content_subtype,
+                "alternatives": getattr(message, "alternatives", []),
+                "attachments": attachments,
+            },
+            next_attempt_at=next_attempt_at,
+        )
+
+    def to_message(self, connection=None):
+        data = dict(self.message)
+        alternatives = data.pop("alternatives")
+        attachments = [
+            (filename, base64.b64decode(content), mimetype)
+            for filename, content, mimetype in data.pop("attachments")
+        ]
+        content_subtype = data.pop("content_subtype")
+        message = EmailMultiAlternatives(
+            connection=connection,
+            attachments=attachments,
+            alternatives=[tuple(alternative) for alternative in alternatives],
+            **data,
+        )
+        message.content_subtype = content_subtype
+        return message
@@ -0,0 +1,238 @@
+import datetime
+import io
+import socketserver
+import threading
+from unittest import mock
+
+from django.conf import settings as settings_module
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.testing import use_test_cache
+
+from .delivery import MailServerUnavailable, claim_batch, send_queued
+from .email import get_email_template
+from .models import QueuedEmail
+
+
+def setUpModule():
+    use_test_cache()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP to accept messages, stores them on the server
+    """
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost")
+        while line := self.rfile.readline():
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                data = b""
+                while (line := self.rfile.readline()) != b".\r\n":
+                    data += line
+                self.server.messages.append(data.decode())
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages, self.connections = [], 0
+
+
+class QueuedEmailTests(TestCase):
+    def setUp(self):
+        self.server = SMTPServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings = override_settings(
+            EMAIL_BACKEND="apps.mailer.backend.QueuedEmailBackend",
+            MAILER_DELIVERY_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            EMAIL_USE_SSL=False,
+            EMAIL_USE_TLS=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def send(self, count=1):
+        for index in range(count):
+            message = mail.EmailMultiAlternatives(
+                f"Subject {index}", "Body", "from@example.com", ["to@example.com"]
+            )
+            message.attach_alternative("<p>Body</p>", "text/html")
+            message.attach("notes.txt", "Notes", "text/plain")
+            message.send()
+
+    def test_messages_are_queued_then_delivered_over_one_connection(self):
+        self.send(3)
+        self.assertEqual(QueuedEmail.objects.filter(status="queued").count(), 3)
+        self.assertEqual(self.server.messages, [])
+
+        call_command("send_mail_queue", stdout=mock.Mock())
+        self.assertEqual(QueuedEmail.objects.filter(status="sent").count(), 3)
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertIn("Subject: Subject 0", self.server.messages[0])
+        self.assertIn("<p>Body</p>", self.server.messages[0])
+        self.assertIn('filename="notes.txt"', self.server.messages[0])
+
+    def test_failures_are_retried_with_backoff(self):
+        self.send()
+        smtp = "django.core.mail.backends.smtp.EmailBackend"
+        with override_settings(MAILER_MAX_ATTEMPTS=2), mock.patch(
+            f"{smtp}.open"
+        ), mock.patch(
+            f"{smtp}.send_messages", side_effect=OSError("refused")
+        ), self.assertLogs("apps.mailer.delivery", "WARNING"):
+            self.assertEqual(send_queued(), (0, 1))
+            queued = QueuedEmail.objects.get()
+            self.assertEqual(queued.status, "queued")
+            self.assertEqual(queued.attempts, 1)
+            self.assertEqual(queued.last_error, "OSError: refused")
+            self.assertGreater(queued.next_attempt_at, timezone.now())
+            # not due yet
+            self.assertEqual(send_queued(), (0, 0))
+
+            QueuedEmail.objects.update(
+                next_attempt_at=timezone.now() - datetime.timedelta(seconds=1)
+            )
+            self.assertEqual(send_queued(), (0, 1))
+        self.assertEqual(QueuedEmail.objects.get().status, "failed")
+
+    def test_loop_survives_an_unavailable_server(self):
+        self.send()
+        port = self.server.server_address[1]
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            if len(delays) == 1:
+                # the server comes back during the backoff
+                settings_module.EMAIL_PORT = port
+            else:
+                raise InterruptedError()
+
+        stderr = io.StringIO()
+        with override_settings(EMAIL_PORT=1, MAILER_RETRY_DELAY=0), mock.patch(
+            "apps.mailer.management.commands.send_mail_queue.time.sleep", sleep
+        ), self.assertLogs("apps.mailer.delivery", "WARNING"):
+            with self.assertRaises(InterruptedError):
+                call_command(
+                    "send_mail_queue", loop=True, stdout=io.StringIO(), stderr=stderr
+                )
+        self.assertIn("Mail server unavailable", stderr.getvalue())
+        # backoff, then the idle poll once the queue was drained
+        self.assertEqual(delays, [2.0, 1.0])
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.status, "sent")
+        self.assertEqual(queued.attempts, 0)
+        self.assertEqual(len(self.server.messages), 1)
+
+    def test_without_loop_an_unavailable_server_is_an_error(self):
+        self.send()
+        with override_settings(EMAIL_PORT=1), self.assertLogs(
+            "apps.mailer.delivery", "WARNING"
+        ):
+            with self.assertRaises(CommandError):
+                call_command("send_mail_queue", stdout=io.StringIO())
+        queued = QueuedEmail.objects.get()
+        self.assertEqual((queued.status, queued.attempts), ("queued", 0))
+        self.assertTrue(queued.last_error)
+
+    def test_a_failure_reconnects_once_for_the_rest_of_the_batch(self):
+        self.send(3)
+        smtp = "django.core.mail.backends.smtp.EmailBackend"
+        send = mock.patch(
+            f"{smtp}._send",
+            autospec=True,
+            side_effect=[OSError("dropped"), True, True],
+        )
+        with send, self.assertLogs("apps.mailer.delivery", "WARNING"):
+            self.assertEqual(send_queued(), (2, 1))
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(QueuedEmail.objects.get(attempts=1).status, "queued")
+
+    def test_a_lost_server_does_not_use_attempts(self):
+        self.send(2)
+        smtp = "django.core.mail.backends.smtp.EmailBackend"
+        with override_settings(MAILER_MAX_ATTEMPTS=1), mock.patch(
+            f"{smtp}.open", side_effect=[True, OSError("down")]
+        ), mock.patch(
+            f"{smtp}.send_messages", side_effect=OSError("dropped")
+        ), self.assertLogs("apps.mailer.delivery", "WARNING"):
+            with self.assertRaises(MailServerUnavailable):
+                send_queued()
+        self.assertEqual(
+            list(QueuedEmail.objects.values_list("status", "attempts")),
+            [("queued", 0), ("queued", 0)],
+        )
+
+    def test_workers_never_claim_the_same_messages(self):
+        self.send(2)
+        now = timezone.now()
+        other = []
+        values_list = QuerySet.values_list
+
+        def select_then_race(queryset, *args, **kwargs):
+            candidates = list(values_list(queryset, *args, **kwargs))
+            if not other:
+                # another worker claims the same rows in between
+                other.append(None)
+                other[0] = claim_batch(10, now)
+            return candidates
+
+        with mock.patch.object(QuerySet, "values_list", select_then_race):
+            self.assertEqual(claim_batch(10, now), [])
+        self.assertEqual(len(other[0]), 2)
+        self.assertEqual(claim_batch(10, now), [])
+
+        # claims of a worker that died are taken over once expired
+        later = now + datetime.timedelta(seconds=settings_module.MAILER_CLAIM_TIMEOUT + 1)
+        self.assertEqual(len(claim_batch(10, later)), 2)
+
+
+@override_settings(EMAIL_BACKEND="apps.mailer.backend.QueuedEmailBackend")
+class EmailTemplateTests(TestCase):
+    def test_password_reset_is_rendered_and_queued(self):
+        get_user_model().objects.create_user(
+            "user@example.com", "password", username="user"
+        )
+        response = self.client.post(
+            "/api/auth/users/reset_password/", {"email": "user@example.com"}
+        )
+        self.assertEqual(response.status_code, 204)
+        message = QueuedEmail.objects.get().to_message()
+        self.assertEqual(message.to, ["user@example.com"])
+        self.assertTrue(message.subject.startswith("Password reset on"))
+        self.assertIn("forgot_password_confirm=True", message.body)
+        self.assertEqual(message.alternatives[0][1], "text/html")
+
+    def test_blocks_are_looked_up_once_per_parse(self):
+        template, blocks = get_email_template("email/password_reset.html")
+        self.assertEqual([attr for attr, _node in blocks], ["subject", "body", "html"])
+        self.assertIs(get_email_template("email/password_reset.html")[1], blocks)
@@ -0,0 +1,227 @@
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .mixins import (
+    CacheMixin,
+    CountedPaginator,
+    CustomPagination,
+    FilterMixin,
+    InvalidPage,
+    PageSizeGuardMixin,
+    aget_cache_generation,
+    check_not_modified,
+    get_list_etag,
+    get_object_etag,
+    set_validators,
+)
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of APIView for plain django views served over ASGI \n
+    authentication only hops to a worker thread when a token is sent,
+    anonymous users can read and authenticated users can write
+    """
+
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # token authentication, no session cookies involved
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def initialize_request(self, request):
+        api_request = Request(request, parsers=[JSONParser()], authenticators=())
+        user, auth = AnonymousUser(), None
+        if "HTTP_AUTHORIZATION" in request.META:
+            for authentication_class in self.authentication_classes:
+                result = await sync_to_async(authentication_class().authenticate)(request)
+                if result is not None:
+                    user, auth = result
+                    break
+        api_request.user, api_request.auth = user, auth
+        return api_request
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request = await self.initialize_request(request)
+            if request.method not in SAFE_METHODS and not request.user.is_authenticated:
+                raise NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            # same body as rest_framework.views.exception_handler
+            if isinstance(exc.detail, (list, dict)):
+                data = exc.detail
+            else:
+                data = {"detail": exc.detail}
+            return JsonResponse(data, safe=False, status=exc.status_code)
+
+    def save_serializer(self, serializer):
+        # validation and saving use the sync ORM and file storage
+        if serializer.is_valid():
+            serializer.save()
+            return True
+        return False
+
+
+class AsyncMixinsList(CacheMixin, FilterMixin, PageSizeGuardMixin):
+    model = None
+    class_serializer = None
+
+    async def get(self, request, *args, **kwargs):
+        """
+        List all objects of model, same parameters as MixinsList except
+        cursor pagination and count modes \n
+        oversized pages are always rejected
+        """
+        return await self.acached(self.list, request)
+
+    async def list(self, request):
+        # searches resolve the database of the queryset, the router reads the cache
+        objects, order, query = await sync_to_async(self.filter_objects)(
+            request.query_params
+        )
+        validators = await objects.aaggregate(
+            count=Count("pk"), updated_at=Max("updated_at")
+        )
+        generation = await aget_cache_generation(self.model)
+        etag = get_list_etag(generation, validators["count"], validators["updated_at"])
+        not_modified = check_not_modified(request, etag, validators["updated_at"])
+        if not_modified is not None:
+            return not_modified
+        objects = self.order_objects(objects, order, query, request.query_params)
+        response = await self.list_page(request, objects, validators["count"])
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag, validators["updated_at"])
+        return response
+
+    async def list_page(self, request, objects, total_count):
+
+        pagination = CustomPagination()
+        pagination.request = request
+        if self.guard_page_size(request, pagination, total_count, can_stream=False):
+            return self.page_size_error(request)
+        if not pagination.page_size:
+            if total_count == 0:
+                return pagination.get_paginated_response([], total_count)
+            return self.invalid_page()
+
+        paginator = CountedPaginator(objects, pagination.page_size, count=total_count)
+        page_number = pagination.get_page_number(request, paginator)
+        try:
+            pagination.page = paginator.page(page_number)
+        except InvalidPage:
+            return self.invalid_page()
+        page = [obj async for obj in pagination.page.object_list]
+        serializers = self.class_serializer(page, many=True)
+        return pagination.get_paginated_response(serializers.data, total_count)
+
+    def invalid_page(self):
+        return JsonResponse(
+            {"detail": _("Invalid page.")},
+            safe=False,
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    async def post(self, request):
+        """
+        Create a new object of model
+        """
+        serializer = self.class_serializer(data=request.data)
+        if await sync_to_async(self.save_serializer)(serializer):
+            return JsonResponse(
+                serializer.data, safe=False, status=status.HTTP_201_CREATED
+            )
+        return JsonResponse(
+            serializer.errors, safe=False, status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class AsyncMixinOperations(CacheMixin):
+    model = None
+    class_serializer = None
+
+    async def get_object(self, id):
+        obj = await self.model.objects.filter(pk=id).afirst()
+        if obj is None:
+            raise NotFound()
+        return obj
+
+    async def get(self, request, id):
+        """
+        Show one objects of any model by his id
+        """
+        return await self.acached(self.retrieve, request, id)
+
+    async def retrieve(self, request, id):
+        obj = await self.get_object(id)
+        etag = get_object_etag(obj)
+        not_modified = check_not_modified(request, etag, obj.updated_at)
+        if not_modified is not None:
+            return not_modified
+        serializer = self.class_serializer(obj, many=False)
+        response = JsonResponse(serializer.data, safe=False, status=status.HTTP_200_OK)
+        return set_validators(response, etag, obj.updated_at)
+
+    async def post(self, request, id):
+        """
+        Active one object of model by his id
+        """
+        obj = await self.get_object(id)
+        if not obj.is_active:
+            obj.is_active = True
+            await obj.asave()
+            serializer = self.class_serializer(obj)
+            return JsonResponse(serializer.data, safe=False, status=status.HTTP_200_OK)
+        return JsonResponse(
+            {"detail": _(f"This {self.model.__name__} is active")},
+            safe=False,
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    async def put(self, request, id):
+        """
+        Edit one objects of model by his id
+        """
+        obj = await self.get_object(id)
+        serializer = self.class_serializer(obj, data=request.data)
+        if await sync_to_async(self.save_serializer)(serializer):
+            return JsonResponse(
+                serializer.data, safe=False, status=status.HTTP_202_ACCEPTED
+            )
+        return JsonResponse(
+            serializer.errors, safe=False, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    async def delete(self, request, id):
+        """
+        Delete one objects of model by his id \n
+        realy never delete, only change status to inactive
+        """
+        obj = await self.get_object(id)
+        if obj.is_active:
+            obj.is_active = False
+            await obj.asave()
+            serializer = self.class_serializer(obj)
+            return JsonResponse(
+                serializer.data, safe=False, status=status.HTTP_202_ACCEPTED
+            )
+        return JsonResponse(
+            {"message": _(f"This {self.model.__name__} is inactive")},
+            safe=False,
+            status=status.HTTP_400_BAD_REQUEST,
+        )
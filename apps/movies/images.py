@@ -0,0 +1,132 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+executor = None
+
+
+def get_variant_formats():
+    # formats Pillow can not write are skipped, AVIF needs a plugin with libavif
+    Image.init()
+    return [
+        image_format
+        for image_format in settings.IMAGE_VARIANT_FORMATS
+        if image_format.upper() in Image.SAVE
+    ]
+
+
+def build_variants(field_file):
+    """
+    Write resized copies of an image at IMAGE_VARIANT_WIDTHS in every
+    IMAGE_VARIANT_FORMATS next to it, under variants/ \n
+    file names carry a hash of the original content so they can be cached forever \n
+    returns {"source": name, "formats": {format: {width: name}}}
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, "rb") as source:
+        content = source.read()
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    directory, filename = os.path.split(field_file.name)
+    stem = os.path.splitext(filename)[0]
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(content)))
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    # never upscale, images narrower than every width get one variant at their size
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS if width < image.width]
+    widths = widths or [image.width]
+
+    formats = {}
+    for image_format in get_variant_formats():
+        formats[image_format] = {}
+        for width in widths:
+            name = os.path.join(
+                directory, "variants", f"{stem}-{digest}-{width}.{image_format}"
+            )
+            if not storage.exists(name):
+                height = max(1, round(image.height * width / image.width))
+                buffer = io.BytesIO()
+                image.resize((width, height), Image.LANCZOS).save(
+                    buffer, image_format.upper(), quality=settings.IMAGE_VARIANT_QUALITY
+                )
+                name = storage.save(name, ContentFile(buffer.getvalue()))
+            formats[image_format][str(width)] = name
+    return {"source": field_file.name, "formats": formats}
+
+
+def generate_variants(model, pk, field_name):
+    """
+    Build the variants of one image field and store them on the object,
+    unless the image changed in the meantime
+    """
+    close_old_connections()
+    try:
+        obj = model._default_manager.filter(pk=pk).first()
+        field_file = getattr(obj, field_name, None)
+        if not field_file:
+            return
+        try:
+            variants = build_variants(field_file)
+        except (OSError, Image.DecompressionBombError):
+            logger.exception("Could not build variants of %s", field_file.name)
+            return
+        model._default_manager.filter(pk=pk, **{field_name: field_file.name}).update(
+            **{f"{field_name}_variants": variants}, updated_at=timezone.now()
+        )
+        # update() skips signals, updated_at changes ETags of the new srcset
+        from .mixins import invalidate_cache
+
+        invalidate_cache(model, pk)
+    finally:
+        close_old_connections()
+
+
+def submit(function, *args):
+    global executor
+    if not settings.IMAGE_VARIANTS_ASYNC:
+        return function(*args)
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix="image-variants"
+        )
+    return executor.submit(function, *args)
+
+
+def wait_for_variants():
+    """
+    Block until every submitted variant is built, for commands that tear
+    down the database or media files afterwards
+    """
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=True)
+        executor = None
+
+
+def schedule_variants(instance):
+    """
+    Build variants of the model image_variant_fields whose file changed, once
+    the current transaction commits and off the request thread
+    """
+    model = type(instance)
+    for field_name in getattr(model, "image_variant_fields", ()):
+        field_file = getattr(instance, field_name)
+        variants = getattr(instance, f"{field_name}_variants") or {}
+        if field_file and variants.get("source") != field_file.name:
+            transaction.on_commit(
+                lambda field_name=field_name: submit(
+                    generate_variants, model, instance.pk, field_name
+                )
+            )
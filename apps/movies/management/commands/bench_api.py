@@ -0,0 +1,260 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.movies.management.commands.loadtest import percentile
+from apps.movies.images import wait_for_variants
+from apps.movies.models import Movie
+from apps.movies.seed import (
+    BACKDROP,
+    NOUNS,
+    OBJECTS,
+    POSTER,
+    generate_movies,
+    seed_movies,
+)
+
+SCENARIOS = (
+    "list",
+    "list_page",
+    "list_page_size",
+    "list_order",
+    "list_cursor",
+    "list_query",
+    "detail",
+    "create",
+    "update",
+    "login",
+)
+ORDERS = ("title", "popularity", "vote_average", "release_date")
+PASSWORD = "bench-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with N movies and measure the API "
+        "in process (django.test.Client): throughput and p50/p99 latency of "
+        "list, detail, create, update and JWT login requests.\n\n"
+        "--json prints one document per run, e.g. to track regressions per commit:\n"
+        "  manage.py bench_api --movies 100000 --json > bench-$(git rev-parse --short HEAD).json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movies", type=int, default=10000, help="movies seeded")
+        parser.add_argument(
+            "-n", "--requests", type=int, default=200, help="per scenario"
+        )
+        parser.add_argument(
+            "-w", "--warmup", type=int, default=10, help="untimed requests"
+        )
+        parser.add_argument(
+            "--cache",
+            choices=("cold", "warm"),
+            default="cold",
+            help="cold clears the cache before every timed request",
+        )
+        parser.add_argument(
+            "-s", "--scenario", action="append", choices=SCENARIOS, help="default: all"
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="keep the test database (and its movies) for the next run",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="random seed")
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        # image variants built after updates go to a scratch media root
+        media_root = tempfile.mkdtemp(prefix="bench-api-")
+        for name in (POSTER, BACKDROP):
+            os.makedirs(os.path.join(media_root, os.path.dirname(name)), exist_ok=True)
+            shutil.copy(
+                os.path.join(settings.MEDIA_ROOT, name), os.path.join(media_root, name)
+            )
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                result = self.run(options)
+                wait_for_variants()
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result))
+            return
+        self.stdout.write(
+            f"{result['movies']} movies, cache {result['cache']}, "
+            f"seeded in {result['seed_seconds']}s"
+        )
+        for name, values in result["scenarios"].items():
+            self.stdout.write(
+                f"{name:>16}: {values['rps']:>8} req/s, p50 {values['p50_ms']:>8} ms, "
+                f"p99 {values['p99_ms']:>8} ms, statuses {values['statuses']}"
+            )
+
+    def run(self, options):
+        start = time.perf_counter()
+        existing = Movie.objects.count()
+        if existing < options["movies"]:
+            seed_movies(
+                options["movies"] - existing, start=existing, seed=options["seed"]
+            )
+        seed_seconds = time.perf_counter() - start
+        total = Movie.objects.count()
+
+        user_model = get_user_model()
+        user = user_model.objects.filter(email="bench@example.com").first()
+        if user is None:
+            user = user_model.objects.create_user(
+                "bench@example.com", PASSWORD, username="bench"
+            )
+        client = APIClient()
+        authorization = f"JWT {AccessToken.for_user(user)}"
+        scenarios = self.get_scenarios(client, authorization, total)
+
+        rand = random.Random(options["seed"])
+        results = {}
+        for name in options["scenario"] or SCENARIOS:
+            results[name] = self.measure(
+                scenarios[name],
+                rand,
+                options["requests"],
+                options["warmup"],
+                options["cache"],
+            )
+        return {
+            "commit": get_commit(),
+            "movies": total,
+            "cache": options["cache"],
+            "requests": options["requests"],
+            "seed_seconds": round(seed_seconds, 3),
+            "scenarios": results,
+        }
+
+    def measure(self, request, rand, requests, warmup, cache_mode):
+        for _index in range(warmup):
+            request(rand)
+        latencies, statuses = [], {}
+        for _index in range(requests):
+            if cache_mode == "cold":
+                cache.clear()
+            start = time.perf_counter()
+            response = request(rand)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        latencies.sort()
+        elapsed = sum(latencies)
+        return {
+            "requests": requests,
+            "seconds": round(elapsed, 3),
+            "rps": round(requests / elapsed, 1) if elapsed else 0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0,
+            "statuses": {str(key): value for key, value in statuses.items()},
+        }
+
+    def get_scenarios(self, client, authorization, total):
+        """
+        Request builders by scenario name, each takes a Random and returns
+        the response
+        """
+        movies = reverse("movies")
+        ids = list(Movie.objects.values_list("id", flat=True))
+        pages = max(1, total // 25)
+        created = iter(range(total, total + 10**9))
+        words = [noun.lower() for noun in NOUNS] + [
+            text.split()[-1] for text in OBJECTS
+        ]
+        headers = {"Authorization": authorization}
+
+        def create(rand):
+            movie = next(generate_movies(1, start=next(created)))
+            data = {
+                "title": movie.title,
+                "overview": movie.overview,
+                "release_date": movie.release_date.isoformat(),
+                "original_title": movie.original_title,
+                "original_language": movie.original_language,
+                "popularity": movie.popularity,
+                "vote_average": movie.vote_average,
+            }
+            return client.post(movies, data, format="json", headers=headers)
+
+        def update(rand):
+            url = reverse("movie", args=[rand.choice(ids)])
+            data = {"overview": f"Updated overview {rand.random()}"}
+            return client.patch(url, data, format="json", headers=headers)
+
+        return {
+            "list": lambda rand: client.get(movies),
+            "list_page": lambda rand: client.get(
+                movies, {"page": rand.randint(1, pages)}
+            ),
+            "list_page_size": lambda rand: client.get(
+                movies,
+                {"page_size": 100, "page": rand.randint(1, max(1, total // 100))},
+            ),
+            "list_order": lambda rand: client.get(
+                movies,
+                {
+                    "order": rand.choice(ORDERS),
+                    "active": "true",
+                    "page": rand.randint(1, 10),
+                },
+            ),
+            "list_cursor": lambda rand: client.get(
+                movies,
+                {"pagination": "cursor", "order": rand.choice(ORDERS), "count": "none"},
+            ),
+            "list_query": lambda rand: client.get(
+                movies, {"query": rand.choice(words)}
+            ),
+            "detail": lambda rand: client.get(
+                reverse("movie", args=[rand.choice(ids)])
+            ),
+            "create": create,
+            "update": update,
+            "login": lambda rand: client.post(
+                reverse("jwt-create"),
+                {"email": "bench@example.com", "password": PASSWORD},
+                format="json",
+            ),
+        }
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,75 @@
+import pickle
+import statistics
+import time
+import uuid
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.test import RequestFactory
+
+from apps.movies.mixins import decode_response, encode_response
+
+
+class Command(BaseCommand):
+    help = "Compare cache hit latency and memory per entry of cached list responses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=25, help="objects per page")
+        parser.add_argument("--iterations", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        response = JsonResponse(self.build_page(options["rows"]), safe=False)
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        iterations = options["iterations"]
+
+        strategies = {
+            "response object": (response, lambda value: value),
+            "encoded bytes": (
+                encode_response(response),
+                lambda value: decode_response(value, request),
+            ),
+            "encoded gzip": (
+                encode_response(response, compress_min_length=0),
+                lambda value: decode_response(value, request),
+            ),
+        }
+
+        for name, (value, build) in strategies.items():
+            cache = LocMemCache(f"bench-{name}", {})
+            cache.set("key", value)
+            timings = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                build(cache.get("key"))
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"{name:>16}: {len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)):>8} bytes/entry, "
+                f"p50 {statistics.median(timings) * 1e6:8.1f} us, "
+                f"mean {statistics.fmean(timings) * 1e6:8.1f} us"
+            )
+
+    def build_page(self, rows):
+        return {
+            "count": rows,
+            "next": None,
+            "previous": None,
+            "results": [
+                {
+                    "id": str(uuid.uuid4()),
+                    "title": f"Movie {index}",
+                    "overview": "A long enough overview to look like a real one " * 2,
+                    "release_date": "2024-01-01",
+                    "poster": f"http://localhost:8000/media/posters/{index}.webp",
+                    "backdrop": f"http://localhost:8000/media/backdrops/{index}.webp",
+                    "original_title": f"Movie {index}",
+                    "original_language": "en",
+                    "popularity": 10.5,
+                    "vote_average": 7.1,
+                    "is_active": True,
+                    "created_at": "2024-01-01T00:00:00Z",
+                    "updated_at": "2024-01-01T00:00:00Z",
+                }
+                for index in range(rows)
+            ],
+        }
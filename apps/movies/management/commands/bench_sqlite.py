@@ -0,0 +1,153 @@
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.movies.management.commands.loadtest import percentile
+from apps.movies.seed import generate_movies
+
+# sqlite3 defaults as Django used them before core.sqlite
+PROFILES = {
+    "rollback": ({"journal_mode": "DELETE", "synchronous": "FULL"}, "BEGIN"),
+    "tuned": (settings.SQLITE_PRAGMAS, "BEGIN IMMEDIATE"),
+}
+SCHEMA = (
+    "CREATE TABLE movie (id INTEGER PRIMARY KEY, title TEXT, overview TEXT, "
+    "popularity REAL, updated_at REAL)",
+    "CREATE INDEX movie_popular_idx ON movie (popularity, id)",
+)
+READ_SQL = "SELECT * FROM movie ORDER BY popularity, id LIMIT 25 OFFSET ?"
+WRITE_SQL = "UPDATE movie SET overview = ?, updated_at = ? WHERE id = ?"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read and write throughput of concurrent worker processes on "
+        "a scratch SQLite file, with the rollback journal defaults and with "
+        "SQLITE_PRAGMAS. Readers page through the catalog while writers "
+        "update one row per transaction, as gunicorn workers would."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument(
+            "--profile", action="append", choices=PROFILES, help="default: all"
+        )
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix="bench-sqlite-")
+        try:
+            source = os.path.join(directory, "source.sqlite3")
+            build_database(source, options["rows"])
+            results = {}
+            for name in options["profile"] or PROFILES:
+                path = os.path.join(directory, f"{name}.sqlite3")
+                shutil.copy(source, path)
+                results[name] = run_profile(path, name, options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results))
+            return
+        for name, values in results.items():
+            self.stdout.write(
+                f"{name:>10}: {values['reads_per_second']:>9} reads/s "
+                f"(p50 {values['read_p50_ms']} ms, p99 {values['read_p99_ms']} ms), "
+                f"{values['writes_per_second']:>7} writes/s "
+                f"(p50 {values['write_p50_ms']} ms, p99 {values['write_p99_ms']} ms), "
+                f"{values['errors']} errors"
+            )
+
+
+def build_database(path, rows):
+    connection = sqlite3.connect(path, isolation_level=None)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    connection.execute("BEGIN")
+    connection.executemany(
+        "INSERT INTO movie VALUES (?, ?, ?, ?, ?)",
+        (
+            (index, movie.title, movie.overview, movie.popularity, time.time())
+            for index, movie in enumerate(generate_movies(rows))
+        ),
+    )
+    connection.execute("COMMIT")
+    connection.close()
+
+
+def run_profile(path, name, options):
+    pragmas, begin = PROFILES[name]
+    roles = ["read"] * options["readers"] + ["write"] * options["writers"]
+    # wall clock, shared by the processes
+    start_at = time.time() + 0.5
+    stop_at = start_at + options["seconds"]
+    with multiprocessing.Pool(len(roles)) as pool:
+        outcomes = pool.starmap(
+            run_worker,
+            [
+                (path, pragmas, begin, role, options["rows"], start_at, stop_at)
+                for role in roles
+            ],
+        )
+
+    latencies = {"read": [], "write": []}
+    errors = 0
+    for role, worker_latencies, worker_errors in outcomes:
+        latencies[role].extend(worker_latencies)
+        errors += worker_errors
+    result = {}
+    for role, values in latencies.items():
+        values.sort()
+        result[f"{role}s"] = len(values)
+        result[f"{role}s_per_second"] = round(len(values) / options["seconds"], 1)
+        result[f"{role}_p50_ms"] = round(percentile(values, 0.50) * 1000, 3)
+        result[f"{role}_p99_ms"] = round(percentile(values, 0.99) * 1000, 3)
+    result["errors"] = errors
+    return result
+
+
+def run_worker(path, pragmas, begin, role, rows, start_at, stop_at):
+    """
+    Read or write until stop_at, returns (role, latencies, errors), busy
+    errors count once the 5 seconds sqlite3 timeout expired
+    """
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for name, value in pragmas.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    rand = random.Random(os.getpid())
+    latencies, errors = [], 0
+    time.sleep(max(0, start_at - time.time()))
+    while time.time() < stop_at:
+        started = time.perf_counter()
+        try:
+            if role == "read":
+                connection.execute(
+                    READ_SQL, (rand.randrange(max(1, rows - 25)),)
+                ).fetchall()
+            else:
+                connection.execute(begin)
+                connection.execute(
+                    WRITE_SQL,
+                    (f"Edited {rand.random()}", time.time(), rand.randrange(rows)),
+                )
+                connection.execute("COMMIT")
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    return role, latencies, errors
@@ -0,0 +1,241 @@
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+from itertools import chain
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+
+from apps.movies.models import Movie
+from apps.movies.mixins import invalidate_cache
+from apps.movies.seed import BACKDROP, POSTER, generate_movies, insert_movies
+
+FIELDS = (
+    "title",
+    "overview",
+    "release_date",
+    "poster",
+    "backdrop",
+    "original_title",
+    "original_language",
+    "popularity",
+    "vote_average",
+    "is_active",
+)
+ARTWORK = ("poster", "backdrop")
+
+# applied for the duration of the load only: a crash of the process can not
+# corrupt the database, a power loss during the load may
+LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -256 * 1024,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk load movies from CSV / NDJSON files (.csv, .ndjson, .jsonl) or "
+        "generate them with --generate. Rows are parsed in worker processes "
+        "and inserted with bulk_create, rows whose title already exists are "
+        "skipped. Missing artwork points to shared placeholder files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="*", help="CSV or NDJSON catalogs")
+        parser.add_argument("--generate", type=int, default=0, help="movies generated")
+        parser.add_argument("--start", type=int, help="first generated index")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(), help="parsing processes"
+        )
+        parser.add_argument(
+            "--no-placeholders",
+            action="store_true",
+            help="leave missing artwork empty",
+        )
+
+    def handle(self, *args, **options):
+        if not options["files"] and not options["generate"]:
+            raise CommandError("Give files to import or --generate N")
+        for path in options["files"]:
+            if get_format(path) is None:
+                raise CommandError(f"Unknown format of {path}, use .csv or .ndjson")
+
+        placeholders = not options["no_placeholders"]
+        tasks = []
+        if options["generate"]:
+            start = options["start"]
+            if start is None:
+                start = Movie.objects.count()
+            tasks.extend(
+                generate_tasks(
+                    options["generate"],
+                    start,
+                    options["seed"],
+                    options["batch_size"],
+                    placeholders,
+                )
+            )
+
+        connection = connections[router.db_for_write(Movie)]
+        self.rows, errors = 0, []
+        started = time.perf_counter()
+        with load_pragmas(connection), parser_pool(options["workers"]) as imap:
+            tasks = chain(
+                tasks,
+                *(
+                    read_tasks(path, options["batch_size"], placeholders)
+                    for path in options["files"]
+                ),
+            )
+            movies = self.collect(imap(parse_chunk, tasks), errors)
+            inserted = insert_movies(
+                movies, options["batch_size"], ignore_conflicts=True
+            )
+        invalidate_cache(Movie)
+        elapsed = time.perf_counter() - started
+
+        for row, message in errors[:20]:
+            self.stderr.write(f"{row}: {message}")
+        self.stdout.write(
+            f"Loaded {inserted} movies in {elapsed:.1f}s "
+            f"({inserted / max(elapsed, 0.001):.0f}/s), {self.rows - inserted} "
+            f"duplicates and {len(errors)} invalid rows skipped"
+        )
+
+    def collect(self, results, errors):
+        for values, chunk_errors in results:
+            errors.extend(chunk_errors)
+            self.rows += len(values)
+            for row in values:
+                yield Movie(**row)
+
+
+def get_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    return None
+
+
+@contextmanager
+def load_pragmas(connection):
+    # synchronous can not change inside a transaction
+    if connection.vendor != "sqlite" or connection.in_atomic_block:
+        yield
+        return
+    saved = {}
+    with connection.cursor() as cursor:
+        for name, value in LOAD_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}")
+            saved[name] = cursor.fetchone()[0]
+            cursor.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for name, value in saved.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@contextmanager
+def parser_pool(workers):
+    """
+    Yield an ordered imap, over worker processes when workers > 1 \n
+    the database is only used by this process
+    """
+    if workers <= 1:
+        yield map
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield pool.imap
+
+
+def generate_tasks(count, start, seed, chunk_size, placeholders):
+    for offset in range(0, count, chunk_size):
+        size = min(chunk_size, count - offset)
+        yield ("generate", "generated", start + offset, (size, seed), placeholders)
+
+
+def read_tasks(path, chunk_size, placeholders):
+    """
+    Split a file in chunks of rows, csv is read here as quoted values may
+    span lines, ndjson lines are decoded by the workers
+    """
+    file_format = get_format(path)
+    with open(
+        path, newline="" if file_format == "csv" else None, encoding="utf-8"
+    ) as file:
+        rows = csv.DictReader(file) if file_format == "csv" else file
+        first = 1
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield (file_format, path, first, chunk, placeholders)
+                first += len(chunk)
+                chunk = []
+        if chunk:
+            yield (file_format, path, first, chunk, placeholders)
+
+
+def parse_chunk(task):
+    """
+    Turn a chunk into Movie field values, runs in the worker processes \n
+    returns (values, [(row, error)])
+    """
+    file_format, source, first, rows, placeholders = task
+    if file_format == "generate":
+        count, seed = rows
+        # artwork is left to the placeholders option
+        rows = (
+            {field: getattr(movie, field) for field in FIELDS if field not in ARTWORK}
+            for movie in generate_movies(count, first, seed)
+        )
+    values, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            if file_format == "ndjson":
+                if not row.strip():
+                    continue
+                row = json.loads(row)
+            values.append(clean_row(row, placeholders))
+        except (ValueError, TypeError, KeyError) as exc:
+            errors.append(
+                (f"{source} row {first + index}", f"{type(exc).__name__}: {exc}")
+            )
+    return values, errors
+
+
+def clean_row(row, placeholders):
+    title = str(row["title"]).strip()
+    if not title:
+        raise ValueError("title is empty")
+    release_date = row["release_date"]
+    if not isinstance(release_date, datetime.date):
+        release_date = datetime.date.fromisoformat(release_date)
+    is_active = row.get("is_active", True)
+    if isinstance(is_active, str):
+        is_active = is_active.strip().lower() not in ("0", "false", "no", "")
+    poster = row.get("poster") or (POSTER if placeholders else "")
+    backdrop = row.get("backdrop") or (BACKDROP if placeholders else "")
+    return {
+        "title": title,
+        "overview": row.get("overview") or "",
+        "release_date": release_date,
+        "poster": poster,
+        "backdrop": backdrop,
+        "original_title": row.get("original_title") or title,
+        "original_language": row.get("original_language") or "en",
+        "popularity": float(row.get("popularity") or 0),
+        "vote_average": float(row.get("vote_average") or 0),
+        "is_active": bool(is_active),
+    }
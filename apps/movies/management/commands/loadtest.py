@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent GET requests at a running server and report throughput "
+        "and latency percentiles.\n\n"
+        "Compare the same endpoint under both servers, e.g.:\n"
+        "  gunicorn core.wsgi -w 4 -b 127.0.0.1:8000\n"
+        "  uvicorn core.asgi:application --workers 4 --port 8001\n"
+        "  manage.py loadtest http://127.0.0.1:8000/api/movies/ -c 64\n"
+        "  manage.py loadtest http://127.0.0.1:8001/api/async/movies/ -c 64"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+", help="urls requested in turn")
+        parser.add_argument("-c", "--concurrency", type=int, default=32)
+        parser.add_argument("-n", "--requests", type=int, default=2000)
+        parser.add_argument("-H", "--header", action="append", default=[])
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        targets = [urlsplit(url) for url in options["urls"]]
+        for target in targets:
+            if target.scheme != "http":
+                raise CommandError("Only http:// urls are supported")
+        headers = dict(header.split(":", 1) for header in options["header"])
+        result = asyncio.run(
+            run(targets, options["concurrency"], options["requests"], headers)
+        )
+        if options["json"]:
+            self.stdout.write(json.dumps(result))
+            return
+        for key, value in result.items():
+            self.stdout.write(f"{key:>14}: {value}")
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of already sorted values
+    """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def run(targets, concurrency, total, headers):
+    latencies, statuses = [], {}
+    counter = iter(range(total))
+
+    async def worker():
+        connection = None
+        for index in counter:
+            target = targets[index % len(targets)]
+            if connection is None:
+                connection = await asyncio.open_connection(target.hostname, target.port or 80)
+            start = time.perf_counter()
+            try:
+                status, keep_alive = await fetch(connection, target, headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                status, keep_alive = "error", False
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not keep_alive:
+                connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "statuses": {str(key): value for key, value in statuses.items()},
+    }
+
+
+async def fetch(connection, target, headers):
+    """
+    Send one HTTP/1.1 GET on a keep-alive connection and read the whole body
+    """
+    reader, writer = connection
+    path = target.path or "/"
+    if target.query:
+        path = f"{path}?{target.query}"
+    lines = [f"GET {path} HTTP/1.1", f"Host: {target.netloc}"]
+    lines += [f"{name.strip()}: {value.strip()}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    await writer.drain()
+
+    version, status = (await reader.readuntil(b"\r\n")).split()[:2]
+    status = int(status)
+    response_headers = {}
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip().lower()
+
+    if response_headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in response_headers:
+        await reader.readexactly(int(response_headers["content-length"]))
+    else:
+        await reader.read()
+        return status, False
+    if version == b"HTTP/1.0":
+        return status, response_headers.get("connection") == "keep-alive"
+    return status, response_headers.get("connection") != "close"
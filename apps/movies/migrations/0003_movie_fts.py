@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+SEARCH_FIELDS = ["title", "original_title", "overview"]
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    columns = ", ".join(f'"{field}"' for field in SEARCH_FIELDS)
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE "movies_movie_fts" USING fts5('
+        f'"object_id" UNINDEXED, {columns}, '
+        f"tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # documents share the rowid of their movie
+    schema_editor.execute(
+        f'INSERT INTO "movies_movie_fts" (rowid, "object_id", {columns}) '
+        f'SELECT rowid, "id", {columns} FROM "movies_movie"'
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS "movies_movie_fts"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0002_alter_movie_id"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
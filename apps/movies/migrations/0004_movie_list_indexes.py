@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0003_movie_fts"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["is_active", "created_at", "id"],
+                name="movie_active_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["is_active", "popularity", "id"],
+                name="movie_active_popular_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["is_active", "vote_average", "id"], name="movie_active_vote_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(fields=["created_at", "id"], name="movie_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(fields=["title"], name="movie_title_idx"),
+        ),
+    ]
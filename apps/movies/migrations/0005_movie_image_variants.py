@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0004_movie_list_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movie",
+            name="backdrop_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="movie",
+            name="poster_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:20
+
+import string
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def normalize_title(title):
+    # Lower(Trim("title")) on SQLite as of this migration
+    return title.strip(" ").translate(ASCII_LOWER)
+
+
+def rename_duplicate_titles(apps, schema_editor):
+    """
+    Suffix " (2)", " (3)"... to every movie repeating an older title, the
+    constraint can not be created over duplicates, renamed movies are
+    reindexed for search (see 0003_movie_fts)
+    """
+    Movie = apps.get_model("movies", "Movie")
+    taken = set()
+    duplicates = []
+    for movie in Movie.objects.order_by("created_at", "id").only("id", "title"):
+        title = normalize_title(movie.title)
+        if title in taken:
+            duplicates.append(movie)
+        taken.add(title)
+    for movie in duplicates:
+        number = 2
+        while True:
+            suffix = f" ({number})"
+            title = movie.title.strip(" ")[: 100 - len(suffix)] + suffix
+            if normalize_title(title) not in taken:
+                break
+            number += 1
+        taken.add(normalize_title(title))
+        Movie.objects.filter(pk=movie.pk).update(title=title)
+        movie.title = title
+
+    if duplicates and schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'UPDATE "movies_movie_fts" SET "title" = %s WHERE "object_id" = %s',
+                [(movie.title, movie.id.hex) for movie in duplicates],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0005_movie_image_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_titles, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="movie",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower(
+                    django.db.models.functions.text.Trim("title")
+                ),
+                name="movie_title_unique",
+            ),
+        ),
+        # title lookups go through the constraint now
+        migrations.RemoveIndex(
+            model_name="movie",
+            name="movie_title_idx",
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0006_movie_title_unique"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(fields=["updated_at"], name="movie_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(
+                fields=["is_active", "updated_at"], name="movie_active_updated_idx"
+            ),
+        ),
+    ]
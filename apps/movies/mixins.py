@@ -1,48 +1,407 @@
+import base64
+import csv
+import gzip
+import hashlib
+import json
+import re
+from functools import partial
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
 
-from django.db.models import Q, ForeignKey
 from django.forms import ValidationError
-from django.db.models import Q
+from django.db.models import Count, F, Max, Q
+from django.core.exceptions import EmptyResultSet, ValidationError as DjangoValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
 
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError as DRFValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.core.cache import cache
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from django.utils.translation import gettext_lazy as _, get_language
+
+from core.cache import (
+    aget_generation,
+    bump_generations,
+    drop_generations,
+    get_generation,
+)
+from core.metrics import Counter, Histogram
+from core.middleware import record_cache
+from core.routers import read_from_replica, skips_view_cache
+
+from .images import schedule_variants
+from .search import get_search_backend
+
+
+page_size_requested = Histogram(
+    "list_page_size_requested",
+    "page_size asked by clients of list views",
+    ["view"],
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 5000, 10000, 100000),
+)
+page_size_guarded = Counter(
+    "list_page_size_guarded",
+    "oversized pages rejected or streamed by list views",
+    ["view", "action"],
+)
+
+
+def _cache_tag_key(model, pk=None):
+    label = model._meta.label_lower
+    if pk is None:
+        return f"cache-generation-{label}"
+    return f"cache-version-{label}-{pk}"
+
+
+def _written_key(model):
+    return f"cache-written-{model._meta.label_lower}"
+
+
+def can_cache_reads(model):
+    """
+    Whether a response built by the current request may be cached \n
+    replicas may not hold the last writes of model yet, responses read from
+    them are only cached DATABASE_STICKY_SECONDS after the last write
+    """
+    return not read_from_replica() or cache.get(_written_key(model)) is None
+
+
+def get_cache_generation(model, pk=None):
+    """
+    Return the current generation of model (list views) or of one object
+    (detail views), see core.cache
+    """
+    return get_generation(_cache_tag_key(model, pk))
+
+
+async def aget_cache_generation(model, pk=None):
+    return await aget_generation(_cache_tag_key(model, pk))
+
+
+def invalidate_cache(model, pk=None):
+    """
+    Evict cached responses of model, bumping the list generation and
+    the version of object pk when given, once the transaction commits
+    """
+    keys = [_cache_tag_key(model)]
+    if pk is not None:
+        keys.append(_cache_tag_key(model, pk))
+    bump_generations(keys)
+    if settings.DATABASE_REPLICA_ALIASES:
+        transaction.on_commit(
+            partial(
+                cache.set, _written_key(model), True, settings.DATABASE_STICKY_SECONDS
+            )
+        )
+
+
+def invalidate_cache_many(model, pks):
+    """
+    Evict cached responses of model and of every object in pks at once
+    """
+    invalidate_cache(model)
+    drop_generations([_cache_tag_key(model, pk) for pk in pks])
+
+
+def get_object_etag(obj):
+    """
+    Weak ETag of one object, its version is updated_at to the microsecond
+    """
+    return f'W/"{obj.pk}-{int(obj.updated_at.timestamp() * 1_000_000):x}"'
+
+
+def etags_match(etag, header):
+    # weak comparison, the tags only carry the version of the object
+    tags = [tag.removeprefix("W/") for tag in parse_etags(header)]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def get_list_etag(generation, count=None, updated_at=None):
+    """
+    Weak ETag of a filtered set, every write bumps the list generation of
+    the model \n
+    count and latest updated_at are mixed in when they were queried, they keep
+    the tag stable while the generation is shared by every worker
+    """
+    if count is None:
+        return f'W/"{generation:x}"'
+    version = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    return f'W/"{generation:x}-{count}-{version:x}"'
+
+
+def set_validators(response, etag, updated_at):
+    response["ETag"] = etag
+    if updated_at is not None:
+        response["Last-Modified"] = http_date(updated_at.timestamp())
+    return response
+
+
+def check_not_modified(request, etag, updated_at):
+    """
+    Return 304 when the client copy is still current (If-None-Match, else
+    If-Modified-Since), None when the response has to be built
+    """
+    last_modified = int(updated_at.timestamp()) if updated_at else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, updated_at)
+    return response
+
+
+def check_cached_not_modified(request, headers):
+    """
+    Same as check_not_modified against the validators of a cached response
+    """
+    if "ETag" not in headers:
+        return None
+    response = get_conditional_response(
+        request,
+        etag=headers["ETag"],
+        last_modified=parse_http_date_safe(headers.get("Last-Modified")),
+    )
+    if response is not None:
+        for header in ("ETag", "Last-Modified", "Vary"):
+            if header in headers:
+                response[header] = headers[header]
+    return response
+
+
+re_accepts_gzip = re.compile(r"\bgzip\b")
+
+
+def encode_response(response, compress_min_length=None):
+    """
+    Turn a response into a plain tuple ready to be cached \n
+    (status, headers, body, gzipped): bodies of at least compress_min_length
+    bytes are stored gzip-compressed, None disables compression
+    """
+    body = response.content
+    headers = dict(response.items())
+    gzipped = compress_min_length is not None and len(body) >= compress_min_length
+    if gzipped:
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+    return (response.status_code, headers, body, gzipped)
+
+
+def decode_response(payload, request):
+    """
+    Build a response from a cached tuple without re-serializing anything \n
+    gzipped bodies are sent as-is to clients accepting gzip
+    """
+    status_code, headers, body, gzipped = payload
+    if gzipped:
+        if re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+            headers = {**headers, "Content-Encoding": "gzip"}
+        else:
+            body = gzip.decompress(body)
+    return HttpResponse(body, status=status_code, headers=headers)
 
-from django.utils.translation import gettext_lazy as _
 
 class CacheMixin:
     cache_timeout = 60 * 30
+    cache_key_prefix = "view-cache"
+    # bodies of at least this size are cached gzipped, None to disable
+    cache_compress_min_length = 1024
 
     def get_cache_key(self, request, *args, **kwargs):
-        return f"{request.path}-{request.user.id}"
+        pk = kwargs.get("id")
+        generation = get_cache_generation(self.model, pk)
+        return self.build_cache_key(request, generation, pk)
 
-    def get(self, request, *args, **kwargs):
+    def build_cache_key(self, request, generation, pk=None):
+        # list views are tagged by the model generation, detail views by object
+        if pk is None:
+            tag = f"list-{generation}"
+        else:
+            tag = f"{pk}-{generation}"
+        # normalize query string so parameter order does not split entries
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        role = getattr(request.user, "role", "anonymous")
+        raw_key = f"{request.path}?{query}|{role}|{get_language()}"
+        digest = hashlib.md5(raw_key.encode()).hexdigest()
+        return f"{self.cache_key_prefix}-{self.model._meta.label_lower}-{tag}-{digest}"
+
+    def cached(self, handler, request, *args, **kwargs):
+        """
+        Return handler response from cache or call it and store the result \n
+        only successful responses are cached, as encoded bytes plus headers,
+        a hit still answers 304 when its ETag matches the client copy \n
+        users reading their own writes from the primary bypass the cache (see
+        core.routers)
+        """
+        if skips_view_cache():
+            record_cache("bypass")
+            return handler(request, *args, **kwargs)
         cache_key = self.get_cache_key(request, *args, **kwargs)
-        response = cache.get(cache_key)
-        if response is None:
-            response = super().get(request, *args, **kwargs)
-            cache.set(cache_key, response, self.cache_timeout)
+        payload = cache.get(cache_key)
+        record_cache("miss" if payload is None else "hit")
+        if payload is not None:
+            not_modified = check_cached_not_modified(request, payload[1])
+            if not_modified is not None:
+                return not_modified
+            return decode_response(payload, request)
+
+        response = handler(request, *args, **kwargs)
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if (
+            response.status_code == status.HTTP_200_OK
+            and not response.streaming
+            and can_cache_reads(self.model)
+        ):
+            payload = encode_response(response, self.cache_compress_min_length)
+            cache.set(cache_key, payload, self.cache_timeout)
+        return response
+
+    async def acached(self, handler, request, pk=None):
+        """
+        Same as cached for async views, handler is a coroutine function
+        """
+        # the router checks read the cache synchronously
+        replicas = bool(settings.DATABASE_REPLICA_ALIASES)
+        if replicas and await sync_to_async(skips_view_cache)():
+            record_cache("bypass")
+            return await handler(request) if pk is None else await handler(request, pk)
+        generation = await aget_cache_generation(self.model, pk)
+        cache_key = self.build_cache_key(request, generation, pk)
+        payload = await cache.aget(cache_key)
+        record_cache("miss" if payload is None else "hit")
+        if payload is not None:
+            not_modified = check_cached_not_modified(request, payload[1])
+            if not_modified is not None:
+                return not_modified
+            return decode_response(payload, request)
+
+        response = await handler(request) if pk is None else await handler(request, pk)
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if (
+            response.status_code == status.HTTP_200_OK
+            and not response.streaming
+            and (not replicas or await sync_to_async(can_cache_reads)(self.model))
+        ):
+            payload = encode_response(response, self.cache_compress_min_length)
+            await cache.aset(cache_key, payload, self.cache_timeout)
         return response
 
 
+def serialize_chunks(objects, class_serializer, chunk_size):
+    """
+    Serialize objects chunk by chunk while walking the queryset with iterator()
+    """
+    chunk = []
+    for obj in objects.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield from class_serializer(chunk, many=True).data
+            chunk = []
+    if chunk:
+        yield from class_serializer(chunk, many=True).data
+
+
+def seek(queryset, order, value, pk, reverse=False):
+    """
+    Keep objects after (value, pk) in (order, pk) ordering, or before it if reverse
+    """
+    lookup = "lt" if reverse else "gt"
+    return queryset.filter(
+        Q(**{f"{order}__{lookup}": value}) | Q(**{order: value, f"pk__{lookup}": pk})
+    )
+
+
+class CountedPaginator(Paginator):
+    """
+    Django paginator reusing a count computed beforehand by the view
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+
 class CustomPagination(PageNumberPagination):
     page_size = 25
     page_size_query_param = "page_size"
     # We won't set a default page_size here since it will be dynamic
 
-    def paginate_queryset(self, queryset, request, view=None):
-        # Check if a page number is provided in the request
-        page_number = request.query_params.get(self.page_query_param)
+    def parse_page_size(self, request):
         try:
             self.page_size = int(
                 request.query_params.get(self.page_size_query_param, self.page_size)
             )
         except (TypeError, ValueError):
-            self.page_size = self.get_default_page_size()
+            self.page_size = type(self).page_size
+        if self.page_size < 0:
+            self.page_size = type(self).page_size
+        return self.page_size
+
+    def get_page_number_value(self, request):
+        try:
+            return max(1, int(request.query_params.get(self.page_query_param, 1)))
+        except (TypeError, ValueError):
+            return 1
+
+    def estimate_rows(self, request, count):
+        """
+        Number of objects the requested page would really hold
+        """
+        if count is None:
+            return self.page_size
+        offset = (self.get_page_number_value(request) - 1) * self.page_size
+        return max(0, min(self.page_size, count - offset))
+
+    def stream_page(self, queryset, request, count, class_serializer, chunk_size):
+        """
+        Answer the requested page as a streamed JSON document, objects are
+        serialized chunk by chunk instead of being held in memory at once
+        """
+        self.request = request
+        self.parse_page_size(request)
+        paginator = CountedPaginator(queryset, self.page_size, count=count)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            )
+        head = json.dumps(
+            {
+                "count": count,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+            }
+        )
 
+        def content():
+            yield head[:-1] + ', "results": ['
+            separator = ""
+            for row in serialize_chunks(self.page.object_list, class_serializer, chunk_size):
+                yield separator + json.dumps(row, cls=DjangoJSONEncoder)
+                separator = ", "
+            yield "]}"
+
+        return StreamingHttpResponse(content(), content_type="application/json")
+
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        """
+        Paginate by page number \n
+        count: total of objects already known by the view, avoids a second count query
+        """
+        self.parse_page_size(request)
+        self.django_paginator_class = partial(CountedPaginator, count=count)
         return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data, count):
@@ -58,52 +417,240 @@ class CustomPagination(PageNumberPagination):
         )
 
 
-class MixinsList(CacheMixin):
+class KeysetPagination(CustomPagination):
+    """
+    Cursor pagination seeking on (order field, pk) \n
+    every page costs the same as the first one, whatever its depth \n
+    keeps the count/next/previous/results envelope of CustomPagination
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = _("Invalid cursor")
+
+    def __init__(self, order):
+        self.order = order
+
+    def encode_cursor(self, obj, reverse):
+        # value_to_string keeps full precision, microseconds included
+        field = obj._meta.get_field(self.order)
+        position = [field.value_to_string(obj), str(obj.pk), reverse]
+        raw = json.dumps(position).encode()
+        cursor = base64.urlsafe_b64encode(raw).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = model._meta.get_field(self.order).to_python(value)
+            pk = model._meta.pk.to_python(pk)
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, bool(reverse)
+
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        self.request = request
+        self.parse_page_size(request)
+        if not self.page_size:
+            return None
+
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = cursor is not None and cursor[2]
+        if cursor is not None:
+            queryset = seek(queryset, self.order, cursor[0], cursor[1], reverse)
+        prefix = "-" if reverse else ""
+        queryset = queryset.order_by(f"{prefix}{self.order}", f"{prefix}pk")
+
+        page = list(queryset[: self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[: self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = page
+        return page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+class FilterMixin:
+    model = None
+    default_order = "created_at"
+
+    def filter_objects(self, params):
+        """
+        Apply active and query filters of the query string \n
+        returns (objects, order field, search query), objects are not ordered yet
+        """
+        active = params.get("active", None)
+        query = params.get("query", "").strip()
+        order = params.get("order", self.default_order)
+        if order not in [field.name for field in self.model._meta.fields]:
+            order = self.default_order
+
+        objects = self.model.objects.all()
+        if active is not None:
+            active = True if active.lower() == "true" else False
+            # "is_active IN (...)" instead of a bare boolean column lets the
+            # (is_active, order) indexes match on SQLite
+            objects = objects.filter(is_active__in=[active])
+        if query:
+            objects = get_search_backend().search(objects, query)
+        return objects, order, query
+
+    def order_objects(self, objects, order, query, params, ranked=True):
+        # best matches first unless the client asks for an explicit order,
+        # backends without ranking and queries without any term carry no rank
+        if (
+            ranked
+            and query
+            and "order" not in params
+            and "search_rank" in objects.query.extra
+        ):
+            return objects.order_by("search_rank", "id")
+        return objects.order_by(order)
+
+
+class PageSizeGuardMixin:
+    # largest page served at once, per role when listed in role_max_page_size
+    max_page_size = 100
+    role_max_page_size = {"admin": 1000, "owner": 1000}
+    # what to do with larger pages: "reject" with 400 or "stream" the page
+    oversized_page_policy = "reject"
+
+    def get_max_page_size(self, request):
+        role = getattr(request.user, "role", None)
+        return self.role_max_page_size.get(role, self.max_page_size)
+
+    def guard_page_size(self, request, paginator, count, can_stream=True):
+        """
+        Record the requested page_size and check what the page would cost \n
+        returns None when the page can be served, "reject" or "stream" otherwise \n
+        a large page_size is fine as long as the page really holds few objects
+        """
+        view = type(self).__name__
+        page_size = paginator.parse_page_size(request)
+        page_size_requested.observe(page_size, view=view)
+        if paginator.estimate_rows(request, count) <= self.get_max_page_size(request):
+            return None
+        action = self.oversized_page_policy if can_stream else "reject"
+        page_size_guarded.inc(view=view, action=action)
+        return action
+
+    def page_size_error(self, request):
+        return JsonResponse(
+            {"detail": _(f"page_size can not exceed {self.get_max_page_size(request)}")},
+            safe=False,
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class MixinsList(CacheMixin, FilterMixin, PageSizeGuardMixin):
     model = None
     class_serializer = None
     permission_get = None
     permission_post = None
+    permission_put = None
+    permission_delete = None
     responses = None
+    # bulk writes: fields checked for duplicates in one query, rows per INSERT/UPDATE
+    bulk_unique_fields = ()
+    # {field: (expression, function)} of bulk_unique_fields compared normalized,
+    # the function must give in python what the expression gives in the database
+    bulk_unique_normalized = {}
+    bulk_batch_size = 500
+    bulk_max_batch_size = 5000
+    bulk_max_items = 50000
+    # default pagination (page or cursor) and count (exact, cached, approximate, none) modes
+    pagination_mode = "page"
+    count_mode = "exact"
+    count_approximate_timeout = 60 * 60
+    stream_chunk_size = 500
 
     permission_classes = [permission_get]
 
     def get(self, request, *args, **kwargs):
         """
         List all objects of model \n
-        page_size: number of objects per page (default: 25) \n
+        page_size: number of objects per page (default: 25), pages holding more than
+        max_page_size objects are rejected or streamed (see oversized_page_policy) \n
         active: filter by active status (default: no apply filter, true: active, false: inactive) \n
+        query: full text search over model search_fields (best matches first unless order is given) \n
+        order: field to order by (default: created_at) \n
+        pagination: page (default) or cursor, cursor pages seek on (order, id) and ignore search ranking \n
+        count: exact (default), cached (until the next write), approximate (may lag behind writes)
+        or none (cursor pagination only) \n
+        If-None-Match / If-Modified-Since: 304 while the filtered set is unchanged,
+        Last-Modified is only sent with exact counts \n
         """
+        return self.cached(self.list, request, *args, **kwargs)
 
-        active = request.query_params.get("active", None)
-        query = request.query_params.get("query", "")
-        order = request.query_params.get("order", "created_at")
-        if order not in [field.name for field in self.model._meta.fields]:
-            order = "created_at"
-
-        exclude_fields = ["id", "is_active", "created_at", "updated_at"]
-        # add foreign key fields to exclude_fields
-        for field in self.model._meta.fields:
-            if isinstance(field, ForeignKey):
-                exclude_fields.append(field.name)
-                
-        query_filter = Q()
-        for field in self.model._meta.fields:
-            if field.name not in exclude_fields:
-                query_filter |= Q(**{f"{field.name}__icontains": query})                
-
-        if active is not None:
-            active = True if active.lower() == "true" else False
-            objects = (
-                self.model.objects.filter(is_active=bool(active))
-                .filter(query_filter)
-                .order_by(order)
+    def list(self, request, *args, **kwargs):
+        objects, order, query = self.filter_objects(request.query_params)
+        pagination = request.query_params.get("pagination", self.pagination_mode)
+        cursor_mode = pagination == "cursor" or "cursor" in request.query_params
+        count_mode = request.query_params.get("count", self.count_mode)
+        # conditional requests are answered before anything is serialized, an
+        # exact count is queried along with the latest updated_at (replacing
+        # the page count), other count modes only rely on the list generation
+        # and never scan the set
+        generation = get_cache_generation(self.model)
+        exact_count = updated_at = None
+        if count_mode == "exact" or (count_mode == "none" and not cursor_mode):
+            validators = objects.aggregate(
+                updated_at=Max("updated_at"), count=Count("pk")
             )
-        else:
-            objects = self.model.objects.filter(query_filter).order_by(order)
+            exact_count, updated_at = validators["count"], validators["updated_at"]
+        etag = get_list_etag(generation, exact_count, updated_at)
+        not_modified = check_not_modified(request, etag, updated_at)
+        if not_modified is not None:
+            return not_modified
+        response = self.list_page(
+            request, objects, order, query, cursor_mode, count_mode, exact_count
+        )
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag, updated_at)
+        return response
 
-        total_count = objects.count()
-        paginator = CustomPagination()
-        page = paginator.paginate_queryset(objects, request)
+    def list_page(self, request, objects, order, query, cursor_mode, count_mode, exact_count):
+        objects = self.order_objects(
+            objects, order, query, request.query_params, ranked=not cursor_mode
+        )
+
+        if cursor_mode:
+            total_count = self.get_count(objects, count_mode, exact_count)
+            paginator = KeysetPagination(order)
+        else:
+            # page numbers can not be validated without a count
+            total_count = self.get_count(
+                objects, "exact" if count_mode == "none" else count_mode, exact_count
+            )
+            paginator = CustomPagination()
+        # cursor pages need their last object to build links, never streamed
+        oversized = self.guard_page_size(
+            request, paginator, total_count, can_stream=not cursor_mode
+        )
+        if oversized is not None:
+            if oversized == "stream":
+                return paginator.stream_page(
+                    objects, request, total_count, self.class_serializer, self.stream_chunk_size
+                )
+            return self.page_size_error(request)
+        page = paginator.paginate_queryset(objects, request, count=total_count)
 
         if page is not None:
             serializers = self.class_serializer(page, many=True)
@@ -117,12 +664,40 @@ class MixinsList(CacheMixin):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+    def get_count(self, objects, mode, exact_count=None):
+        """
+        Count objects according to mode \n
+        exact: query unless exact_count is already known, cached: reuse the count until the model changes,
+        approximate: reuse the count for count_approximate_timeout even across writes,
+        none: skip counting
+        """
+        if mode == "none":
+            return None
+        if mode not in ("cached", "approximate"):
+            return objects.count() if exact_count is None else exact_count
+        try:
+            sql = str(objects.query)
+        except EmptyResultSet:
+            return 0
+        digest = hashlib.md5(sql.encode()).hexdigest()
+        label = self.model._meta.label_lower
+        if mode == "cached":
+            key = f"count-{label}-{get_cache_generation(self.model)}-{digest}"
+            timeout = self.cache_timeout
+        else:
+            key = f"count-approximate-{label}-{digest}"
+            timeout = self.count_approximate_timeout
+        return cache.get_or_set(key, objects.count, timeout)
+
     permission_classes = [permission_post]
 
     def post(self, request):
         """
-        Create a new object of model
+        Create a new object of model \n
+        an array of objects creates all of them in one transaction (see bulk_create)
         """
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
         # serializes data entry
         objSerializer = self.class_serializer(data=request.data)
         # verify if entry is valid
@@ -143,24 +718,418 @@ class MixinsList(CacheMixin):
         )
 
 
+    permission_classes = [permission_put]
+
+    def put(self, request):
+        """
+        Edit many objects of model, body is an array of objects with their id
+        """
+        return self.bulk_update(request)
+
+    permission_classes = [permission_delete]
+
+    def delete(self, request):
+        """
+        Delete many objects of model, body is an array of ids \n
+        realy never delete, only change status to inactive
+        """
+        return self.bulk_deactivate(request)
+
+    def get_bulk_items(self, request):
+        """
+        Return the array sent in the body or raise a 400 error
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise DRFValidationError({"detail": _("Expected a non empty array")})
+        if len(items) > self.bulk_max_items:
+            raise DRFValidationError(
+                {"detail": _(f"Expected at most {self.bulk_max_items} items")}
+            )
+        return items
+
+    def get_bulk_batch_size(self, request):
+        """
+        batch_size: rows per INSERT/UPDATE statement (default: bulk_batch_size)
+        """
+        try:
+            batch_size = int(request.query_params.get("batch_size", self.bulk_batch_size))
+        except (TypeError, ValueError):
+            batch_size = self.bulk_batch_size
+        return max(1, min(batch_size, self.bulk_max_batch_size))
+
+    def normalize_pk(self, value):
+        """
+        Return the canonical string of a primary key sent by the client or None if invalid
+        """
+        try:
+            pk = self.model._meta.pk.to_python(value)
+        except (TypeError, DjangoValidationError):
+            return None
+        return None if pk is None else str(pk)
+
+    def find_bulk_duplicates(self, serializers, batch_size):
+        """
+        Return {position: errors} of serializers whose bulk_unique_fields are
+        already taken by another object or repeated inside the request \n
+        one query per field and batch
+        """
+        duplicates = {}
+        for field in self.bulk_unique_fields:
+            expression, normalize = self.bulk_unique_normalized.get(
+                field, (models.F(field), lambda value: value)
+            )
+            values = {
+                normalize(serializer.validated_data[field])
+                for serializer in serializers
+                if field in serializer.validated_data
+            }
+            taken = {}
+            values = list(values)
+            objects = self.model.objects.annotate(unique_value=expression)
+            for start in range(0, len(values), batch_size):
+                taken.update(
+                    objects.filter(
+                        unique_value__in=values[start : start + batch_size]
+                    ).values_list("unique_value", "pk")
+                )
+            seen = set()
+            for position, serializer in enumerate(serializers):
+                value = serializer.validated_data.get(field)
+                if value is None:
+                    continue
+                value = normalize(value)
+                instance_pk = getattr(serializer.instance, "pk", None)
+                if (value in taken and taken[value] != instance_pk) or value in seen:
+                    duplicates[position] = {
+                        field: [_(f"This {self.model.__name__} already exists")]
+                    }
+                seen.add(value)
+        return duplicates
+
+    def save_one_by_one(self, objs, save):
+        """
+        Fallback when a batch hit a unique constraint written concurrently,
+        save each object in its own savepoint \n
+        returns (saved, {index: errors})
+        """
+        saved, conflicts = [], {}
+        for index, obj in objs:
+            try:
+                with transaction.atomic():
+                    save(obj)
+            except IntegrityError:
+                conflicts[index] = {
+                    "non_field_errors": [_(f"This {self.model.__name__} already exists")]
+                }
+            else:
+                saved.append((index, obj))
+        return saved, conflicts
+
+    def bulk_response(self, results, success_status):
+        # 207 as soon as one item failed
+        failed = any(result["status"] >= 400 for result in results)
+        return JsonResponse(
+            results,
+            safe=False,
+            status=status.HTTP_207_MULTI_STATUS if failed else success_status,
+        )
+
+    def bulk_create(self, request):
+        """
+        Validate every object, check bulk_unique_fields in one query and insert
+        valid objects with bulk_create in a single transaction \n
+        answers one result (status, data or errors) per item, in order
+        """
+        items = self.get_bulk_items(request)
+        batch_size = self.get_bulk_batch_size(request)
+        results = [None] * len(items)
+
+        valid = []
+        for index, item in enumerate(items):
+            serializer = self.class_serializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer))
+            else:
+                results[index] = {
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": serializer.errors,
+                }
+
+        duplicates = self.find_bulk_duplicates([s for _i, s in valid], batch_size)
+        objs = []
+        for position, (index, serializer) in enumerate(valid):
+            if position in duplicates:
+                results[index] = {
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": duplicates[position],
+                }
+            else:
+                objs.append((index, self.model(**serializer.validated_data)))
+
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(
+                    [obj for _i, obj in objs], batch_size=batch_size
+                )
+        except IntegrityError:
+            objs, conflicts = self.save_one_by_one(
+                objs, lambda obj: obj.save(force_insert=True)
+            )
+            for index, errors in conflicts.items():
+                results[index] = {"status": status.HTTP_400_BAD_REQUEST, "errors": errors}
+        self.after_bulk_write([obj for _i, obj in objs], reindex=True)
+
+        for index, obj in objs:
+            results[index] = {
+                "status": status.HTTP_201_CREATED,
+                "data": self.class_serializer(obj).data,
+            }
+        return self.bulk_response(results, status.HTTP_201_CREATED)
+
+    def bulk_update(self, request):
+        """
+        Edit objects looked up in one query and save them with bulk_update in a
+        single transaction \n
+        answers one result (status, data or errors) per item, in order
+        """
+        items = self.get_bulk_items(request)
+        batch_size = self.get_bulk_batch_size(request)
+        results = [None] * len(items)
+
+        ids = [
+            self.normalize_pk(item.get("id")) if isinstance(item, dict) else None
+            for item in items
+        ]
+        instances = {}
+        lookup = [pk for pk in ids if pk is not None]
+        for start in range(0, len(lookup), batch_size):
+            instances.update(
+                (str(obj.pk), obj)
+                for obj in self.model.objects.filter(pk__in=lookup[start : start + batch_size])
+            )
+
+        valid = []
+        for index, item in enumerate(items):
+            obj = instances.get(ids[index])
+            if obj is None:
+                results[index] = {
+                    "status": status.HTTP_404_NOT_FOUND,
+                    "errors": {"id": [_(f"{self.model.__name__} not found")]},
+                }
+                continue
+            serializer = self.class_serializer(obj, data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer))
+            else:
+                results[index] = {
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": serializer.errors,
+                }
+
+        duplicates = self.find_bulk_duplicates([s for _i, s in valid], batch_size)
+        now = timezone.now()
+        objs, fields = [], set()
+        for position, (index, serializer) in enumerate(valid):
+            if position in duplicates:
+                results[index] = {
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": duplicates[position],
+                }
+                continue
+            obj = serializer.instance
+            for attr, value in serializer.validated_data.items():
+                # same fields as update, the id only identifies the object and
+                # is_active changes through activation and deletion
+                if attr not in self.class_serializer.updatable_fields:
+                    continue
+                setattr(obj, attr, value)
+                fields.add(attr)
+            objs.append((index, obj))
+
+        # bulk_update skips pre_save, commit new files and auto_now by hand
+        fields.add("updated_at")
+        for _index, obj in objs:
+            obj.updated_at = now
+            for field in self.model._meta.fields:
+                if isinstance(field, models.FileField) and field.name in fields:
+                    field.pre_save(obj, add=False)
+
+        try:
+            with transaction.atomic():
+                if objs:
+                    self.model.objects.bulk_update(
+                        [obj for _i, obj in objs], sorted(fields), batch_size=batch_size
+                    )
+        except IntegrityError:
+            objs, conflicts = self.save_one_by_one(
+                objs, lambda obj: obj.save(update_fields=sorted(fields))
+            )
+            for index, errors in conflicts.items():
+                results[index] = {"status": status.HTTP_400_BAD_REQUEST, "errors": errors}
+        self.after_bulk_write([obj for _i, obj in objs], reindex=True)
+
+        for index, obj in objs:
+            results[index] = {
+                "status": status.HTTP_202_ACCEPTED,
+                "data": self.class_serializer(obj).data,
+            }
+        return self.bulk_response(results, status.HTTP_202_ACCEPTED)
+
+    def bulk_deactivate(self, request):
+        """
+        Change status to inactive of every active object in ids with one UPDATE
+        per batch \n
+        answers one result (id, status) per id, in order
+        """
+        items = self.get_bulk_items(request)
+        ids = [self.normalize_pk(pk) for pk in items]
+        batch_size = self.get_bulk_batch_size(request)
+        lookup = [pk for pk in ids if pk is not None]
+        current = {}
+        # rows stay locked from the read to the update (BEGIN IMMEDIATE on
+        # SQLite), concurrent requests never both deactivate the same object
+        with transaction.atomic():
+            for start in range(0, len(lookup), batch_size):
+                current.update(
+                    (str(pk), is_active)
+                    for pk, is_active in self.model.objects.select_for_update()
+                    .filter(pk__in=lookup[start : start + batch_size])
+                    .values_list("pk", "is_active")
+                )
+
+            active_ids = [pk for pk, is_active in current.items() if is_active]
+            for start in range(0, len(active_ids), batch_size):
+                self.model.objects.filter(
+                    pk__in=active_ids[start : start + batch_size], is_active=True
+                ).update(is_active=False, updated_at=timezone.now())
+        self.after_bulk_write(active_ids)
+
+        results = []
+        for item, pk in zip(items, ids):
+            if pk is None or pk not in current:
+                results.append({"id": item, "status": status.HTTP_404_NOT_FOUND})
+            elif current[pk]:
+                results.append({"id": pk, "status": status.HTTP_202_ACCEPTED})
+            else:
+                results.append({"id": pk, "status": status.HTTP_400_BAD_REQUEST})
+        return self.bulk_response(results, status.HTTP_202_ACCEPTED)
+
+    def after_bulk_write(self, objs, reindex=False):
+        """
+        bulk writes skip model signals, evict cache, refresh search index and
+        image variants here \n
+        objs: saved objects, or only their pks when reindex is False
+        """
+        if not objs:
+            return
+        invalidate_cache_many(self.model, [getattr(obj, "pk", obj) for obj in objs])
+        if reindex:
+            get_search_backend().index_many(self.model, objs)
+            for obj in objs:
+                schedule_variants(obj)
+
+
+class Echo:
+    """
+    File-like object returning what is written, feeds csv.writer row by row
+    """
+
+    def write(self, value):
+        return value
+
+
+class MixinsExport(FilterMixin):
+    model = None
+    class_serializer = None
+    export_chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        """
+        Export all objects of model as a stream, memory stays flat whatever the size \n
+        output: ndjson (default) or csv \n
+        active, query, order: same filters as the list, objects are ordered by (order, id) \n
+        after: id of the last object received, resumes the export right after it
+        """
+        objects, order, _query = self.filter_objects(request.query_params)
+        after = request.query_params.get("after")
+        if after:
+            try:
+                value = self.model.objects.filter(pk=after).values_list(order, flat=True).first()
+            except DjangoValidationError:
+                value = None
+            if value is None:
+                return JsonResponse(
+                    {"detail": _(f"{self.model.__name__} not found")},
+                    safe=False,
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            objects = seek(objects, order, value, after)
+        objects = objects.order_by(order, "pk")
+
+        output = request.query_params.get("output", "ndjson")
+        if output == "csv":
+            rows, content_type = self.export_csv(objects), "text/csv"
+        else:
+            output, content_type = "ndjson", "application/x-ndjson"
+            rows = self.export_ndjson(objects)
+        response = StreamingHttpResponse(rows, content_type=content_type)
+        filename = f"{self.model._meta.model_name}s.{output}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def export_rows(self, objects):
+        return serialize_chunks(objects, self.class_serializer, self.export_chunk_size)
+
+    def export_ndjson(self, objects):
+        for row in self.export_rows(objects):
+            yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+    def export_csv(self, objects):
+        writer = csv.writer(Echo())
+        header = None
+        for row in self.export_rows(objects):
+            if header is None:
+                header = list(row)
+                yield writer.writerow(header)
+            yield writer.writerow([self.csv_value(row[field]) for field in header])
+
+    def csv_value(self, value):
+        # nested values (srcsets) as JSON, csv would write their repr
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, cls=DjangoJSONEncoder)
+        return value
+
+
 class MixinOperations(CacheMixin):
     model = None
     class_serializer = None
     permission_get = None
     permission_post = None
     permission_put = None
+    permission_patch = None
     permission_delete = None
 
     def get(self, request, id):
         """
-        Show one objects of any model by his id
+        Show one objects of any model by his id \n
+        If-None-Match / If-Modified-Since: 304 while the object is unchanged
         """
+        return self.cached(self.retrieve, request, id=id)
+
+    def retrieve(self, request, id):
         # Search object by id
         obj = get_object_or_404(self.model, id=id)
+        # the client copy may still be current
+        etag = get_object_etag(obj)
+        not_modified = check_not_modified(request, etag, obj.updated_at)
+        if not_modified is not None:
+            return not_modified
         # serializes object
         serializer = self.class_serializer(obj, many=False)
         # show object
-        return JsonResponse(serializer.data, safe=False, status=status.HTTP_200_OK)
+        response = JsonResponse(serializer.data, safe=False, status=status.HTTP_200_OK)
+        return set_validators(response, etag, obj.updated_at)
     
 
     permission_classes = [permission_post]
@@ -212,6 +1181,68 @@ class MixinOperations(CacheMixin):
             status=status.HTTP_400_BAD_REQUEST
         )
        
+    permission_classes = [permission_patch]
+
+    def patch(self, request, id):
+        """
+        Edit some fields of one object of model by his id, only the changed
+        columns are written and nothing when no value changed \n
+        If-Match (ETag) or If-Unmodified-Since answer 412 when the object was
+        modified since the client read it, concurrent conditional patches
+        of one version can not both succeed
+        """
+        with transaction.atomic():
+            obj = get_object_or_404(self.model, id=id)
+            if not self.preconditions_pass(request, obj):
+                return self.precondition_failed()
+            serializer = self.class_serializer(obj, data=request.data, partial=True)
+            if not serializer.is_valid():
+                return JsonResponse(
+                    serializer.errors, safe=False, status=status.HTTP_400_BAD_REQUEST
+                )
+            if self.has_preconditions(request) and not self.lock_version(obj):
+                return self.precondition_failed()
+            serializer.save()
+            response = JsonResponse(
+                serializer.data, safe=False, status=status.HTTP_200_OK
+            )
+        return set_validators(response, get_object_etag(obj), obj.updated_at)
+
+    def has_preconditions(self, request):
+        return "If-Match" in request.headers or "If-Unmodified-Since" in request.headers
+
+    def lock_version(self, obj):
+        """
+        Conditional UPDATE keeping the row as is, True when obj still holds
+        the stored version \n
+        the row stays locked until the transaction commits, a concurrent
+        write of the checked version makes it match nothing
+        """
+        return (
+            self.model.objects.filter(pk=obj.pk, updated_at=obj.updated_at).update(
+                updated_at=F("updated_at")
+            )
+            == 1
+        )
+
+    def precondition_failed(self):
+        return JsonResponse(
+            {"detail": _(f"This {self.model.__name__} was modified since")},
+            safe=False,
+            status=status.HTTP_412_PRECONDITION_FAILED,
+        )
+
+    def preconditions_pass(self, request, obj):
+        if_match = request.headers.get("If-Match")
+        if if_match is not None:
+            return etags_match(get_object_etag(obj), if_match)
+        if_unmodified_since = parse_http_date_safe(
+            request.headers.get("If-Unmodified-Since")
+        )
+        if if_unmodified_since is not None:
+            return int(obj.updated_at.timestamp()) <= if_unmodified_since
+        return True
+
     permission_classes = [permission_delete]
 
     def delete(self, request, id):
@@ -1,8 +1,21 @@
 from django.db import models
+from django.db.models.functions import Lower, Trim
+import string
 import uuid
 
 # Create your models here.
 
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def normalize_title(title):
+    """
+    Python twin of Lower(Trim("title")) on SQLite, trims spaces and lowers
+    ASCII letters only
+    """
+    return title.strip(" ").translate(ASCII_LOWER)
+
+
 class Movie(models.Model):
     id = models.UUIDField(default=uuid.uuid4, unique=True, primary_key=True)
     title = models.CharField(max_length=100)
@@ -10,6 +23,9 @@ class Movie(models.Model):
     release_date = models.DateField()
     poster = models.ImageField(upload_to='posters/')
     backdrop = models.ImageField(upload_to='backdrops/')
+    # resized copies written by images.build_variants
+    poster_variants = models.JSONField(default=dict, blank=True, editable=False)
+    backdrop_variants = models.JSONField(default=dict, blank=True, editable=False)
     original_title = models.CharField(max_length=100)
     original_language = models.CharField(max_length=50)
     popularity = models.FloatField()
@@ -18,5 +34,37 @@ class Movie(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # fields indexed by the search backend, keep in sync with 0003_movie_fts
+    search_fields = ("title", "original_title", "overview")
+    # image fields resized by images.schedule_variants after each save
+    image_variant_fields = ("poster", "backdrop")
+
+    class Meta:
+        # list views filter on is_active and order by these fields, id breaks ties
+        indexes = [
+            models.Index(
+                fields=["is_active", "created_at", "id"], name="movie_active_created_idx"
+            ),
+            models.Index(
+                fields=["is_active", "popularity", "id"], name="movie_active_popular_idx"
+            ),
+            models.Index(
+                fields=["is_active", "vote_average", "id"], name="movie_active_vote_idx"
+            ),
+            models.Index(fields=["created_at", "id"], name="movie_created_idx"),
+            # latest updated_at of a filtered set validates list responses
+            models.Index(fields=["updated_at"], name="movie_updated_idx"),
+            models.Index(
+                fields=["is_active", "updated_at"], name="movie_active_updated_idx"
+            ),
+        ]
+        # titles are unique ignoring case and surrounding spaces, the
+        # serializer turns violations into validation errors
+        constraints = [
+            models.UniqueConstraint(
+                Lower(Trim("title")), name="movie_title_unique"
+            ),
+        ]
+
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -0,0 +1,147 @@
+import re
+from functools import lru_cache, reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+
+re_search_terms = re.compile(r"\w+")
+
+
+def get_search_fields(model):
+    """
+    Return the fields declared as searchable in model.search_fields
+    """
+    search_fields = getattr(model, "search_fields", None)
+    if not search_fields:
+        raise ImproperlyConfigured(
+            f"{model.__name__} must declare search_fields to be searchable"
+        )
+    return search_fields
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+class LikeSearchBackend:
+    """
+    Portable backend, OR of icontains over the declared search fields \n
+    every search is a full table scan
+    """
+
+    def search(self, queryset, query):
+        fields = get_search_fields(queryset.model)
+        return queryset.filter(
+            reduce(or_, (Q(**{f"{field}__icontains": query}) for field in fields))
+        )
+
+    def index(self, instance):
+        pass
+
+    def index_many(self, model, instances):
+        pass
+
+    def remove(self, instance):
+        pass
+
+    def rebuild(self, model):
+        pass
+
+
+class SQLiteFTSSearchBackend(LikeSearchBackend):
+    """
+    SQLite FTS5 backend, ranked with bm25 \n
+    documents live in the <db_table>_fts virtual table, created by the
+    model migrations and kept in sync by save/delete signals \n
+    falls back to LikeSearchBackend on other databases
+    """
+
+    def get_table(self, model):
+        return f"{model._meta.db_table}_fts"
+
+    def get_connection(self, model, instance=None):
+        connection = connections[router.db_for_write(model, instance=instance)]
+        return connection if connection.vendor == "sqlite" else None
+
+    def get_match(self, query):
+        # every term is a prefix query, terms are ANDed
+        terms = re_search_terms.findall(query)
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        model = queryset.model
+        if connections[queryset.db].vendor != "sqlite":
+            return super().search(queryset, query)
+
+        match = self.get_match(query)
+        if not match:
+            return queryset.none()
+
+        table = self.get_table(model)
+        pk_column = f'"{model._meta.db_table}"."{model._meta.pk.column}"'
+        return queryset.extra(
+            select={"search_rank": f'bm25("{table}")'},
+            tables=[table],
+            where=[f'"{table}"."object_id" = {pk_column}', f'"{table}" MATCH %s'],
+            params=[match],
+        )
+
+    def index(self, instance):
+        self.index_many(type(instance), [instance])
+
+    def index_many(self, model, instances):
+        connection = self.get_connection(model)
+        if connection is None:
+            return
+        fields = get_search_fields(model)
+        table = self.get_table(model)
+        db_table = model._meta.db_table
+        pk_field = model._meta.pk
+        columns = ", ".join(f'"{field}"' for field in fields)
+        placeholders = ", ".join(["%s"] * (len(fields) + 1))
+        rows = []
+        for instance in instances:
+            pk = pk_field.get_db_prep_value(instance.pk, connection)
+            rows.append((pk, *(getattr(instance, field) for field in fields), pk))
+        # documents share the rowid of their row, unique unlike a slice of the pk
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO "{table}" (rowid, "object_id", {columns}) '
+                f'SELECT "{db_table}".rowid, {placeholders} FROM "{db_table}" '
+                f'WHERE "{db_table}"."{pk_field.column}" = %s',
+                rows,
+            )
+
+    def remove(self, instance):
+        model = type(instance)
+        connection = self.get_connection(model, instance)
+        if connection is None:
+            return
+        # the row is gone already, its document is found by object_id
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM "{self.get_table(model)}" WHERE "object_id" = %s',
+                [model._meta.pk.get_db_prep_value(instance.pk, connection)],
+            )
+
+    def rebuild(self, model, batch_size=2000):
+        connection = self.get_connection(model)
+        if connection is None:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{self.get_table(model)}"')
+        queryset = model._default_manager.only(*get_search_fields(model))
+        batch = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                self.index_many(model, batch)
+                batch = []
+        if batch:
+            self.index_many(model, batch)
@@ -0,0 +1,121 @@
+"""
+Deterministic catalog of made up movies for benchmarks and local data.
+"""
+
+import datetime
+import random
+
+from django.db import transaction
+
+from .mixins import invalidate_cache
+from .models import Movie
+from .search import get_search_backend
+
+ADJECTIVES = (
+    "Silent", "Broken", "Golden", "Last", "Hidden", "Crimson", "Endless", "Frozen",
+    "Burning", "Lost", "Midnight", "Savage", "Distant", "Electric", "Hollow",
+    "Wild", "Bitter", "Secret", "Iron", "Velvet", "Forgotten", "Restless",
+)
+NOUNS = (
+    "Harbor", "Kingdom", "Promise", "Horizon", "River", "Empire", "Garden",
+    "Shadow", "Winter", "Signal", "Frontier", "Orchard", "Machine", "Summer",
+    "Witness", "Tide", "Island", "Circus", "Letter", "Station", "Crown", "Storm",
+)
+PATTERNS = ("The {adjective} {noun}", "{adjective} {noun}", "{noun} of the {adjective}")
+SUBJECTS = (
+    "A retired detective", "Two estranged sisters", "A young pilot", "The last heir",
+    "A small town teacher", "An ambitious chef", "A stranded crew", "A street musician",
+)
+VERBS = (
+    "uncovers", "chases", "protects", "rebuilds", "escapes", "questions", "betrays",
+    "follows",
+)
+OBJECTS = (
+    "a family secret", "a stolen painting", "a forgotten war", "an impossible heist",
+    "the truth about a fire", "a mysterious signal", "an old promise", "a rival crew",
+)
+PLACES = (
+    "in Lisbon", "across the desert", "before dawn", "on a frozen lake",
+    "in a sleepy port", "during the festival", "under the city", "at sea",
+)
+LANGUAGES = ("en", "en", "en", "es", "fr", "ja", "ko", "it", "de", "pt")
+POSTER = "posters/corbata.jpg"
+BACKDROP = "backdrops/Hot-lips-kiss-romance.jpg"
+
+TITLES = [
+    pattern.format(adjective=adjective, noun=noun)
+    for pattern in PATTERNS
+    for adjective in ADJECTIVES
+    for noun in NOUNS
+]
+
+
+def get_title(index):
+    # titles repeat as sequels, so every index has its own title
+    title = TITLES[index % len(TITLES)]
+    part = index // len(TITLES)
+    return title if part == 0 else f"{title} {part + 1}"
+
+
+def generate_movies(count, start=0, seed=0):
+    """
+    Yield count unsaved movies, numbered from start \n
+    the same (start, seed) always yields the same movies, they all share the
+    same poster and backdrop files
+    """
+    for index in range(start, start + count):
+        rand = random.Random(seed * 1_000_003 + index)
+        title = get_title(index)
+        overview = (
+            f"{rand.choice(SUBJECTS)} {rand.choice(VERBS)} "
+            f"{rand.choice(OBJECTS)} {rand.choice(PLACES)}."
+        )
+        yield Movie(
+            title=title,
+            overview=overview,
+            release_date=datetime.date(1950, 1, 1)
+            + datetime.timedelta(days=rand.randrange(75 * 365)),
+            poster=POSTER,
+            backdrop=BACKDROP,
+            original_title=title,
+            original_language=rand.choice(LANGUAGES),
+            popularity=round(rand.lognormvariate(2, 1), 3),
+            vote_average=round(min(10, max(0, rand.gauss(6.5, 1.4))), 1),
+        )
+
+
+def insert_movies(movies, batch_size=2000, ignore_conflicts=False):
+    """
+    Insert an iterable of unsaved movies and index them for search, each batch
+    in its own transaction \n
+    signals are skipped, call invalidate_cache once done \n
+    returns the number of inserted movies, ignored conflicts excluded
+    """
+    backend = get_search_backend()
+    movies = iter(movies)
+    inserted = 0
+    while batch := [movie for _index, movie in zip(range(batch_size), movies)]:
+        with transaction.atomic():
+            Movie.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+            if ignore_conflicts:
+                # pks are set before the insert, keep the rows really written
+                pks = [movie.pk for movie in batch]
+                written = set()
+                for start in range(0, len(pks), 10000):
+                    written.update(
+                        Movie.objects.filter(pk__in=pks[start : start + 10000])
+                        .values_list("pk", flat=True)
+                    )
+                batch = [movie for movie in batch if movie.pk in written]
+            backend.index_many(Movie, batch)
+        inserted += len(batch)
+    return inserted
+
+
+def seed_movies(count, start=0, seed=0, batch_size=2000):
+    """
+    Insert count generated movies, returns their number
+    """
+    inserted = insert_movies(generate_movies(count, start, seed), batch_size)
+    invalidate_cache(Movie)
+    return inserted
@@ -1,47 +1,141 @@
+import hashlib
+import time
+from contextlib import contextmanager
 from rest_framework import serializers
 from drf_extra_fields.fields import Base64ImageField
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from urllib.parse import urlparse
 
+from core.middleware import record_serializer_time
+
 from .models import Movie
 
+def hash_chunks(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.digest()
+
+def same_content(field_file, upload):
+    """
+    Whether upload holds the bytes already stored in field_file, sizes are
+    compared before reading anything
+    """
+    if not field_file or upload is None:
+        return False
+    try:
+        if field_file.size != upload.size:
+            return False
+        with field_file.open('rb'):
+            stored = hash_chunks(field_file)
+    except OSError:
+        return False
+    same = stored == hash_chunks(upload)
+    upload.seek(0)
+    return same
+
+class LimitedBase64ImageField(Base64ImageField):
+    """
+    Base64ImageField for small images only, the JSON body holds the whole
+    image several times while it is decoded \n
+    larger images go through the multipart artwork endpoint
+    """
+
+    def to_internal_value(self, base64_data):
+        max_size = settings.BASE64_IMAGE_MAX_SIZE
+        # 4 base64 characters encode 3 bytes, check before decoding
+        if isinstance(base64_data, str) and len(base64_data) * 3 // 4 > max_size:
+            raise serializers.ValidationError(
+                f'Base64 images are limited to {max_size} bytes, '
+                'upload larger ones to the artwork endpoint'
+            )
+        return super().to_internal_value(base64_data)
+
 class MovieSerializer(serializers.ModelSerializer):
-    poster = Base64ImageField(required=False)
-    backdrop = Base64ImageField(required=False)
+    poster = LimitedBase64ImageField(required=False)
+    backdrop = LimitedBase64ImageField(required=False)
+    poster_srcset = serializers.SerializerMethodField()
+    backdrop_srcset = serializers.SerializerMethodField()
+    # fields written by update, activation has its own endpoints
+    updatable_fields = (
+        'title', 'overview', 'release_date', 'poster', 'backdrop', 'original_title',
+        'original_language', 'popularity', 'vote_average',
+    )
     class Meta:
         model = Movie
-        fields = '__all__'
+        exclude = ('poster_variants', 'backdrop_variants')
 
     def to_representation(self, instance):
+        started = time.perf_counter()
         representation = super().to_representation(instance)
         if representation['poster']:
             representation["poster"] = self.get_base_url(instance.poster.url)
         if representation['backdrop']:
             representation["backdrop"] = self.get_base_url(instance.backdrop.url)
+        record_serializer_time(time.perf_counter() - started)
         return representation
 
-    def validate(self, attrs):        
-        if 'title' in attrs:
-            if Movie.objects.filter(title=attrs['title']).exists():
-                raise serializers.ValidationError('This movie already exists')
-        return attrs
+    def get_poster_srcset(self, instance):
+        return self.get_srcset(instance.poster, instance.poster_variants)
+
+    def get_backdrop_srcset(self, instance):
+        return self.get_srcset(instance.backdrop, instance.backdrop_variants)
+
+    def get_srcset(self, image, variants):
+        """
+        {format: {width: url}} of the resized copies, empty until they are built
+        or when the image changed since
+        """
+        if not image or not variants or variants.get('source') != image.name:
+            return {}
+        return {
+            image_format: {
+                width: self.get_base_url(image.storage.url(name))
+                for width, name in widths.items()
+            }
+            for image_format, widths in variants['formats'].items()
+        }
 
     def create(self, validated_data):
-        return Movie.objects.create(**validated_data)
+        with self.unique_title():
+            return Movie.objects.create(**validated_data)
 
     def update(self, instance, validated_data):
-        instance.title = validated_data.get('title', instance.title)
-        instance.overview = validated_data.get('overview', instance.overview)
-        instance.release_date = validated_data.get('release_date', instance.release_date)
-        instance.poster = validated_data.get('poster', instance.poster)
-        instance.backdrop = validated_data.get('backdrop', instance.backdrop)
-        instance.original_title = validated_data.get('original_title', instance.original_title)
-        instance.original_language = validated_data.get('original_language', instance.original_language)
-        instance.popularity = validated_data.get('popularity', instance.popularity)
-        instance.vote_average = validated_data.get('vote_average', instance.vote_average)
-        instance.save()
+        """
+        Set the values that changed and save only their columns, images
+        identical to the stored ones are left alone
+        """
+        changed = []
+        for attr, value in validated_data.items():
+            if attr not in self.updatable_fields:
+                continue
+            if attr in ('poster', 'backdrop'):
+                if same_content(getattr(instance, attr), value):
+                    continue
+            elif getattr(instance, attr) == value:
+                continue
+            setattr(instance, attr, value)
+            changed.append(attr)
+        if changed:
+            with self.unique_title():
+                instance.save(update_fields=changed + ['updated_at'])
         return instance
 
+    @contextmanager
+    def unique_title(self):
+        """
+        Turn a violation of movie_title_unique into a validation error, the
+        savepoint keeps the outer transaction usable
+        """
+        try:
+            with transaction.atomic():
+                yield
+        except IntegrityError as exc:
+            if 'movie_title_unique' not in str(exc):
+                raise
+            raise serializers.ValidationError({'title': ['This movie already exists']})
+
     def get_base_url(self, url):
         parsed_url = urlparse(url)
         production_url = f"{settings.DOMAIN}{parsed_url.path}"
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .images import schedule_variants
+from .mixins import invalidate_cache
+from .models import Movie
+from .search import get_search_backend
+
+
+@receiver([post_save, post_delete], sender=Movie)
+def invalidate_movie_cache(sender, instance, **kwargs):
+    invalidate_cache(sender, instance.pk)
+
+
+@receiver(post_save, sender=Movie)
+def index_movie(sender, instance, **kwargs):
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Movie)
+def remove_movie_from_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance)
+
+
+@receiver(post_save, sender=Movie)
+def build_movie_image_variants(sender, instance, **kwargs):
+    schedule_variants(instance)
@@ -1,3 +1,1522 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+import warnings
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.conf import settings as settings_module
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http.multipartparser import MultiPartParser
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.asyncio import async_unsafe
+from django.utils.functional import SimpleLazyObject
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import metrics
+from core.routers import PrimaryReplicaRouter, current_request, stick_to_primary
+from core.routers import use_primary as use_primary_sync
+from core.testing import use_test_cache
+
+from .images import get_variant_formats
+from .mixins import _cache_tag_key, get_cache_generation
+from .models import Movie
+from .seed import TITLES, generate_movies, insert_movies, seed_movies
+from .serializers import MovieSerializer
+from .uploads import ImageUploadHandler
+from .views import MovieList, MovieOperations
+
+
+def setUpModule():
+    use_test_cache()
+
+
+def create_movie(title="Movie", **kwargs):
+    data = {
+        "title": title,
+        "overview": "Overview",
+        "release_date": datetime.date(2024, 1, 1),
+        "poster": "posters/corbata.jpg",
+        "backdrop": "backdrops/Hot-lips-kiss-romance.jpg",
+        "original_title": title,
+        "original_language": "en",
+        "popularity": 1.0,
+        "vote_average": 5.0,
+    }
+    data.update(kwargs)
+    return Movie.objects.create(**data)
+
+
+class CacheMixinTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_list_cache_keys_on_query_string(self):
+        create_movie("Alpha")
+        create_movie("Beta")
+        url = reverse("movies")
+        first = self.client.get(url, {"page_size": 1, "order": "title"})
+        second = self.client.get(url, {"page_size": 1, "order": "title", "page": 2})
+        self.assertEqual(first.json()["results"][0]["title"], "Alpha")
+        self.assertEqual(second.json()["results"][0]["title"], "Beta")
+
+    def test_list_cache_is_invalidated_on_save(self):
+        url = reverse("movies")
+        self.assertEqual(self.client.get(url).json()["count"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_movie("Alpha")
+        self.assertEqual(self.client.get(url).json()["count"], 1)
+
+    def test_detail_cache_is_invalidated_on_save(self):
+        movie = create_movie("Alpha")
+        url = reverse("movie", args=[movie.id])
+        self.assertEqual(self.client.get(url).json()["title"], "Alpha")
+        movie.title = "Gamma"
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.save()
+        self.assertEqual(self.client.get(url).json()["title"], "Gamma")
+
+    def test_invalidation_waits_for_commit(self):
+        movie = create_movie("Alpha")
+        url = reverse("movie", args=[movie.id])
+        self.client.get(url)
+        movie.title = "Gamma"
+        with self.captureOnCommitCallbacks() as callbacks:
+            movie.save()
+            # a read before the commit keeps the generation of the old row
+            self.assertEqual(self.client.get(url).json()["title"], "Alpha")
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url).json()["title"], "Gamma")
+
+    def test_cache_hit_skips_database(self):
+        movie = create_movie("Alpha")
+        url = reverse("movie", args=[movie.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_cache_hit_serves_gzipped_bytes(self):
+        for index in range(20):
+            create_movie(f"Movie {index}")
+        url = reverse("movies")
+        miss = self.client.get(url)
+        hit = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(hit["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(hit.content), miss.content)
+        plain = self.client.get(url)
+        self.assertEqual(plain.content, miss.content)
+        self.assertEqual(plain["Content-Type"], "application/json")
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("movies")
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {"query": query, **params})
+        return [movie["title"] for movie in response.json()["results"]]
+
+    def test_search_matches_prefixes_of_declared_fields(self):
+        create_movie("The Matrix", overview="Neo wakes up")
+        create_movie("Inception", overview="Dreams within dreams")
+        self.assertEqual(self.search("matr"), ["The Matrix"])
+        self.assertEqual(self.search("dream"), ["Inception"])
+        self.assertEqual(self.search("neo matrix"), ["The Matrix"])
+        self.assertEqual(self.search("missing"), [])
+
+    def test_search_ranks_best_match_first(self):
+        create_movie("Space", overview="Nothing about that")
+        create_movie("Space Space", overview="Space odyssey in space")
+        self.assertEqual(self.search("space"), ["Space Space", "Space"])
+        self.assertEqual(self.search("space", order="title"), ["Space", "Space Space"])
+
+    def test_query_without_terms_matches_nothing(self):
+        create_movie("The Matrix")
+        for query in ("-", "!!!"):
+            self.assertEqual(self.search(query), [])
+            response = self.client.get(reverse("async-movies"), {"query": query})
+            self.assertEqual(response.status_code, 200)
+
+    def test_ids_sharing_their_upper_bits_keep_their_own_documents(self):
+        upper = uuid.uuid4().int >> 65 << 65
+        create_movie("Alien", id=uuid.UUID(int=upper | 1))
+        create_movie("Brazil", id=uuid.UUID(int=upper | 2))
+        self.assertEqual(self.search("alien"), ["Alien"])
+        self.assertEqual(self.search("brazil"), ["Brazil"])
+
+    def test_index_follows_save_and_delete(self):
+        movie = create_movie("Alien")
+        movie.title = "Aliens"
+        movie.save()
+        self.assertEqual(self.search("aliens"), ["Aliens"])
+        movie.delete()
+        self.assertEqual(self.search("alien"), [])
+
+    def test_search_does_not_scan_movies(self):
+        create_movie("Alien")
+        with CaptureQueriesContext(connection) as queries:
+            self.search("alien")
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries[-1]['sql']}")
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn("VIRTUAL TABLE INDEX", plan)
+        self.assertNotIn("SCAN movies_movie ", f"{plan} ")
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("movies")
+        for index in range(7):
+            create_movie(f"Movie {index}", popularity=index % 3)
+
+    def walk(self, url, params=None, link="next"):
+        titles, count = [], None
+        while url:
+            data = self.client.get(url, params).json()
+            params, count = None, data["count"]
+            titles.append([movie["title"] for movie in data["results"]])
+            url = data[link]
+        return titles, count
+
+    def test_list_counts_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {"page_size": 2, "page": 2})
+        counts = [query for query in queries if "COUNT(" in query["sql"]]
+        self.assertEqual(len(counts), 1)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        params = {"pagination": "cursor", "page_size": 3, "order": "popularity"}
+        pages, count = self.walk(self.url, params)
+        self.assertEqual(count, 7)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        ordered = list(
+            Movie.objects.order_by("popularity", "pk").values_list("title", flat=True)
+        )
+        self.assertEqual(sum(pages, []), ordered)
+
+        last = self.client.get(self.url, params).json()
+        last = self.client.get(last["next"]).json()
+        last = self.client.get(last["next"]).json()
+        back, _count = self.walk(last["previous"], link="previous")
+        self.assertEqual(back, [ordered[3:6], ordered[0:3]])
+
+    def test_cursor_pages_can_skip_count(self):
+        params = {"pagination": "cursor", "count": "none"}
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(self.url, params).json()
+        self.assertIsNone(data["count"])
+        self.assertEqual(len(data["results"]), 7)
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries))
+
+    def test_cached_count_is_invalidated_on_save(self):
+        params = {"count": "cached"}
+        self.assertEqual(self.client.get(self.url, params).json()["count"], 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_movie("Movie 7")
+        self.assertEqual(self.client.get(self.url, params).json()["count"], 8)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "nope"})
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for index in range(3):
+            create_movie(f"Movie {index}")
+
+    def get_page_plan(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("movies"), params)
+        sql = next(query["sql"] for query in queries if "LIMIT" in query["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [str(row[-1]) for row in cursor.fetchall()]
+
+    def test_list_uses_indexes(self):
+        cases = [
+            ({"active": "true"}, "movie_active_created_idx"),
+            ({"active": "true", "order": "popularity"}, "movie_active_popular_idx"),
+            ({"active": "true", "order": "vote_average"}, "movie_active_vote_idx"),
+            ({}, "movie_created_idx"),
+            ({"active": "true", "pagination": "cursor"}, "movie_active_created_idx"),
+        ]
+        for params, index in cases:
+            with self.subTest(params=params):
+                plan = self.get_page_plan(params)
+                self.assertTrue(any(index in step for step in plan), plan)
+                full_scans = [
+                    step
+                    for step in plan
+                    if step.startswith("SCAN movies_movie") and "INDEX" not in step
+                ]
+                self.assertEqual(full_scans, [])
+                self.assertFalse(any("TEMP B-TREE" in step for step in plan), plan)
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "bulk@example.com", "password", username="bulk"
+            )
+        )
+        self.url = reverse("movies")
+
+    def movie_data(self, title, **kwargs):
+        data = {
+            "title": title,
+            "overview": "Overview",
+            "release_date": "2024-01-01",
+            "original_title": title,
+            "original_language": "en",
+            "popularity": 1.0,
+            "vote_average": 5.0,
+        }
+        data.update(kwargs)
+        return data
+
+    def test_bulk_create_reports_each_item(self):
+        create_movie("Taken")
+        items = [
+            self.movie_data("First"),
+            self.movie_data("Taken"),
+            self.movie_data("First"),
+            self.movie_data("Broken", popularity="high"),
+            self.movie_data("Second"),
+        ]
+        response = self.client.post(f"{self.url}?batch_size=2", items, format="json")
+        self.assertEqual(response.status_code, 207)
+        statuses = [result["status"] for result in response.json()]
+        self.assertEqual(statuses, [201, 400, 400, 400, 201])
+        self.assertEqual(
+            set(Movie.objects.values_list("title", flat=True)),
+            {"Taken", "First", "Second"},
+        )
+        # created movies are searchable and listed right away
+        listed = self.client.get(self.url, {"query": "second"}).json()
+        self.assertEqual([movie["title"] for movie in listed["results"]], ["Second"])
+
+    def test_bulk_update_keeps_own_title(self):
+        first, second = create_movie("First"), create_movie("Second")
+        self.client.get(self.url)
+        items = [
+            self.movie_data("First", id=str(first.id), popularity=9.0),
+            self.movie_data("First", id=str(second.id)),
+            self.movie_data("Ghost", id="not-an-id"),
+        ]
+        response = self.client.put(self.url, items, format="json")
+        self.assertEqual(
+            [result["status"] for result in response.json()], [202, 400, 404]
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.popularity, 9.0)
+        self.assertGreater(first.updated_at, first.created_at)
+        listed = self.client.get(self.url, {"order": "popularity"}).json()
+        self.assertEqual(listed["results"][-1]["popularity"], 9.0)
+
+    def test_bulk_update_writes_updatable_fields_only(self):
+        active, inactive = create_movie("Active"), create_movie("Off", is_active=False)
+        items = [
+            self.movie_data("Active", id=str(active.id), is_active=False),
+            self.movie_data("Off", id=str(inactive.id), is_active=True, overview="New"),
+        ]
+        response = self.client.put(self.url, items, format="json")
+        self.assertEqual([result["status"] for result in response.json()], [202, 202])
+        active.refresh_from_db()
+        inactive.refresh_from_db()
+        self.assertTrue(active.is_active)
+        self.assertFalse(inactive.is_active)
+        self.assertEqual(inactive.overview, "New")
+
+    def test_bulk_deactivate(self):
+        first, second = create_movie("First"), create_movie("Second", is_active=False)
+        response = self.client.delete(
+            self.url, [str(first.id), second.id.hex, "nope"], format="json"
+        )
+        self.assertEqual(
+            [result["status"] for result in response.json()], [202, 400, 404]
+        )
+        first.refresh_from_db()
+        self.assertFalse(first.is_active)
+
+    def test_bulk_deactivate_reads_and_writes_in_one_transaction(self):
+        movie = create_movie("First")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(self.url, [str(movie.id)], format="json")
+        statements = [query["sql"].split()[0] for query in queries]
+        start = statements.index("SAVEPOINT")
+        self.assertLess(start, statements.index("SELECT"))
+        self.assertLess(statements.index("UPDATE"), statements.index("RELEASE"))
+
+    def test_bulk_rejects_non_arrays(self):
+        response = self.client.delete(self.url, {"id": "x"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("movies-export")
+        for index in range(5):
+            create_movie(f"Movie {index}", popularity=index, is_active=index != 2)
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson_export_honors_filters(self):
+        response, body = self.export(active="true", order="popularity")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [row["title"] for row in rows],
+            ["Movie 0", "Movie 1", "Movie 3", "Movie 4"],
+        )
+
+    def test_export_resumes_after_last_id(self):
+        _response, body = self.export(order="popularity")
+        rows = [json.loads(line) for line in body.splitlines()]
+        _response, body = self.export(order="popularity", after=rows[1]["id"])
+        resumed = [json.loads(line)["id"] for line in body.splitlines()]
+        self.assertEqual(resumed, [row["id"] for row in rows[2:]])
+
+    def test_csv_export(self):
+        response, body = self.export(output="csv", query="movie")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["title"], "Movie 0")
+
+    def test_csv_export_encodes_srcsets_as_json(self):
+        movie = Movie.objects.get(title="Movie 0")
+        variants = {
+            "source": movie.poster.name,
+            "formats": {"webp": {"320": "p-320.webp"}},
+        }
+        Movie.objects.filter(pk=movie.pk).update(poster_variants=variants)
+        _response, body = self.export(output="csv", order="popularity")
+        row = next(csv.DictReader(io.StringIO(body)))
+        srcset = json.loads(row["poster_srcset"])
+        self.assertTrue(srcset["webp"]["320"].endswith("p-320.webp"))
+        self.assertEqual(json.loads(row["backdrop_srcset"]), {})
+
+    def test_export_unknown_after(self):
+        response = self.client.get(self.url, {"after": "nope"})
+        self.assertEqual(response.status_code, 404)
+
+
+class PageSizeGuardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("movies")
+        for index in range(5):
+            create_movie(f"Movie {index}")
+
+    def test_large_page_size_is_fine_when_page_is_small(self):
+        response = self.client.get(self.url, {"page_size": 1000000})
+        self.assertEqual(len(response.json()["results"]), 5)
+
+    def test_invalid_page_size_falls_back_to_the_default(self):
+        for page_size in ("-3", "abc"):
+            response = self.client.get(self.url, {"page_size": page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["results"]), 5)
+
+    async def test_async_invalid_page_size_falls_back_to_the_default(self):
+        for page_size in ("-3", "abc"):
+            response = await self.async_client.get(
+                reverse("async-movies"), {"page_size": page_size}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["results"]), 5)
+
+    def test_oversized_page_is_rejected(self):
+        with mock.patch.object(MovieList, "max_page_size", 2):
+            response = self.client.get(self.url, {"page_size": 3})
+            self.assertEqual(response.status_code, 400)
+            response = self.client.get(self.url, {"page_size": 3, "page": 2})
+            self.assertEqual(response.status_code, 200)
+        self.assertIn("list_page_size_guarded_total", metrics.render())
+
+    def test_role_limit(self):
+        user = get_user_model().objects.create_user(
+            "admin@example.com", "password", username="admin", role="admin"
+        )
+        self.client.force_authenticate(user)
+        with mock.patch.object(MovieList, "max_page_size", 2):
+            response = self.client.get(self.url, {"page_size": 5})
+        self.assertEqual(response.status_code, 200)
+
+    def test_oversized_page_is_streamed(self):
+        with mock.patch.multiple(
+            MovieList, max_page_size=2, oversized_page_policy="stream", stream_chunk_size=2
+        ):
+            response = self.client.get(self.url, {"page_size": 4, "order": "title"})
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["count"], 5)
+        self.assertIsNotNone(data["next"])
+        self.assertEqual(
+            [movie["title"] for movie in data["results"]],
+            ["Movie 0", "Movie 1", "Movie 2", "Movie 3"],
+        )
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    async def test_async_list_and_detail(self):
+        movie = await sync_to_async(create_movie)("Alpha")
+        await sync_to_async(create_movie)("Beta")
+        response = await self.async_client.get(
+            reverse("async-movies"), {"page_size": 1, "order": "title", "page": 2}
+        )
+        data = response.json()
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(data["results"][0]["title"], "Beta")
+        self.assertIsNotNone(data["previous"])
+
+        response = await self.async_client.get(reverse("async-movie", args=[movie.id]))
+        self.assertEqual(response.json()["title"], "Alpha")
+        response = await self.async_client.get(reverse("async-movie", args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_writes_require_authentication(self):
+        movie = await sync_to_async(create_movie)("Alpha")
+        response = await self.async_client.delete(reverse("async-movie", args=[movie.id]))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_async_writes(self):
+        user = await sync_to_async(get_user_model().objects.create_user)(
+            "async@example.com", "password", username="async"
+        )
+        token = str(AccessToken.for_user(user))
+        headers = {"Authorization": f"JWT {token}"}
+        data = {
+            "title": "Gamma",
+            "overview": "Overview",
+            "release_date": "2024-01-01",
+            "original_title": "Gamma",
+            "original_language": "en",
+            "popularity": 1.0,
+            "vote_average": 5.0,
+        }
+        response = await self.async_client.post(
+            reverse("async-movies"), data, content_type="application/json", headers=headers
+        )
+        self.assertEqual(response.status_code, 201)
+        url = reverse("async-movie", args=[response.json()["id"]])
+        response = await self.async_client.delete(url, headers=headers)
+        self.assertEqual(response.status_code, 202)
+        response = await self.async_client.get(url)
+        self.assertFalse(response.json()["is_active"])
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(
+            MEDIA_ROOT=media_root.name,
+            IMAGE_VARIANT_WIDTHS=(320, 640),
+            IMAGE_VARIANT_FORMATS=("webp",),
+            IMAGE_VARIANTS_ASYNC=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        user = get_user_model().objects.create_user(
+            "images@example.com", "password", username="images"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def encode_image(self, width, height):
+        buffer = io.BytesIO()
+        Image.new("RGB", (width, height), "red").save(buffer, "JPEG")
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    def get_data(self, title, poster):
+        return {
+            "title": title,
+            "overview": "Overview",
+            "release_date": "2024-01-01",
+            "poster": poster,
+            "original_title": title,
+            "original_language": "en",
+            "popularity": 1.0,
+            "vote_average": 5.0,
+        }
+
+    def test_upload_builds_variants_after_commit(self):
+        data = self.get_data("Alpha", self.encode_image(800, 1200))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("movies"), data, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["poster_srcset"], {})
+
+        movie = Movie.objects.get(pk=response.json()["id"])
+        self.assertEqual(movie.poster_variants["source"], movie.poster.name)
+        widths = movie.poster_variants["formats"]["webp"]
+        self.assertEqual(list(widths), ["320", "640"])
+        with movie.poster.storage.open(widths["320"]) as variant:
+            self.assertEqual(Image.open(variant).size, (320, 480))
+
+        srcset = self.client.get(reverse("movie", args=[movie.id])).json()["poster_srcset"]
+        self.assertTrue(srcset["webp"]["640"].endswith("-640.webp"))
+
+    def test_unsupported_formats_are_skipped_quietly(self):
+        with override_settings(IMAGE_VARIANT_FORMATS=("webp", "avif", "nope")):
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                formats = get_variant_formats()
+        self.assertEqual(formats[0], "webp")
+        self.assertNotIn("nope", formats)
+
+    def test_small_images_are_not_upscaled(self):
+        movie = create_movie("Alpha", backdrop="")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse("movie", args=[movie.id]),
+                self.get_data("Beta", self.encode_image(200, 300)),
+                format="json",
+            )
+        self.assertEqual(response.status_code, 202)
+        movie.refresh_from_db()
+        self.assertEqual(list(movie.poster_variants["formats"]["webp"]), ["200"])
+
+
+class ArtworkUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(
+            MEDIA_ROOT=media_root.name,
+            ARTWORK_MAX_UPLOAD_SIZE=64 * 1024,
+            BASE64_IMAGE_MAX_SIZE=1024,
+            FILE_UPLOAD_MAX_MEMORY_SIZE=1024,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.movie = create_movie("Alpha")
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "artwork@example.com", "password", username="artwork"
+            )
+        )
+
+    def get_image(self, width=64, height=96, image_format="PNG"):
+        buffer = io.BytesIO()
+        Image.effect_noise((width, height), 64).save(buffer, image_format)
+        buffer.seek(0)
+        buffer.name = f"poster.{image_format.lower()}"
+        return buffer
+
+    def upload(self, file, field="poster"):
+        url = reverse("movie-artwork", args=[self.movie.id, field])
+        return self.client.put(url, {"file": file}, format="multipart")
+
+    def test_upload_replaces_image(self):
+        response = self.upload(self.get_image())
+        self.assertEqual(response.status_code, 202)
+        self.movie.refresh_from_db()
+        self.assertTrue(self.movie.poster.name.startswith("posters/poster"))
+        self.assertEqual(Image.open(self.movie.poster.path).size, (64, 96))
+        self.assertEqual(
+            os.listdir(os.path.join(settings_module.MEDIA_ROOT, ".uploads")), []
+        )
+
+    def test_upload_goes_through_the_multipart_parser_only(self):
+        receive = mock.patch.object(
+            ImageUploadHandler,
+            "receive_data_chunk",
+            autospec=True,
+            side_effect=ImageUploadHandler.receive_data_chunk,
+        )
+        with receive as received:
+            response = self.upload(self.get_image())
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(received.called)
+
+        url = reverse("movie-artwork", args=[self.movie.id, "poster"])
+        response = self.client.put(url, {"file": "poster.png"}, format="json")
+        self.assertEqual(response.status_code, 415)
+
+    def test_upload_rejects_other_types_and_sizes(self):
+        response = self.upload(io.BytesIO(b"%PDF-1.4 not an image"))
+        self.assertEqual(response.status_code, 415)
+        response = self.upload(self.get_image(20, 20, "BMP"))
+        self.assertEqual(response.status_code, 415)
+        # rejected while streaming and before reading the body
+        response = self.upload(self.get_image(270, 270))
+        self.assertEqual(response.status_code, 413)
+        response = self.upload(self.get_image(400, 400))
+        self.assertEqual(response.status_code, 413)
+        response = self.upload(self.get_image(), field="overview")
+        self.assertEqual(response.status_code, 404)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.poster.name, "posters/corbata.jpg")
+
+    def test_stopped_upload_leaves_a_file_to_close(self):
+        # parse with Django's parser directly, DRF would hide its errors
+        content = io.BytesIO(b"%PDF-1.4 not an image")
+        content.name = "poster.pdf"
+        body = encode_multipart(BOUNDARY, {"file": content})
+        meta = {
+            "CONTENT_TYPE": MULTIPART_CONTENT,
+            "CONTENT_LENGTH": str(len(body)),
+        }
+        handler = ImageUploadHandler()
+        _post, files = MultiPartParser(meta, io.BytesIO(body), [handler]).parse()
+        self.assertEqual(len(files), 0)
+        self.assertEqual(handler.error[0], 415)
+        self.assertTrue(handler.file.closed)
+        self.assertEqual(
+            os.listdir(os.path.join(settings_module.MEDIA_ROOT, ".uploads")), []
+        )
+
+    def test_base64_images_are_limited(self):
+        data = base64.b64encode(self.get_image(200, 200).getvalue()).decode()
+        response = self.client.put(
+            reverse("movie", args=[self.movie.id]),
+            {"title": "Beta", "poster": data},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("artwork endpoint", response.json()["poster"][0])
+
+
+class MediaServeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        os.makedirs(os.path.join(media_root.name, "posters"))
+        with open(os.path.join(media_root.name, "posters", "alpha.jpg"), "wb") as file:
+            file.write(bytes(range(256)) * 4)
+        self.url = reverse("media", args=["posters/alpha.jpg"])
+
+    def test_etag_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(256)) * 4)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Content-Length"], "1024")
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_ranges(self):
+        response = self.client.get(self.url, headers={"Range": "bytes=10-19"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.client.get(self.url, headers={"Range": "bytes=-4"})
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(252, 256)))
+
+        response = self.client.get(self.url, headers={"Range": "bytes=2000-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */1024")
+
+        # the range is dropped once the file changed
+        response = self.client.get(
+            self.url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_offload_and_missing_files(self):
+        with override_settings(MEDIA_SERVE_MODE="x-accel-redirect"):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/posters/alpha.jpg")
+        self.assertEqual(response.content, b"")
+        response = self.client.get(reverse("media", args=["posters/missing.jpg"]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("media", args=["../secrets.txt"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_offloaded_paths_are_quoted(self):
+        name = "posters/día 1?%.jpg"
+        with open(os.path.join(settings_module.MEDIA_ROOT, name), "wb") as file:
+            file.write(b"image")
+        with override_settings(MEDIA_SERVE_MODE="x-accel-redirect"):
+            response = self.client.get(reverse("media", args=[name]))
+        quoted = "posters/d%C3%ADa%201%3F%25.jpg"
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{quoted}")
+        with override_settings(MEDIA_SERVE_MODE="x-sendfile"):
+            response = self.client.get(reverse("media", args=[name]))
+        self.assertTrue(response["X-Sendfile"].endswith(f"/{quoted}"))
+
+    def test_hidden_paths_are_not_served(self):
+        uploads = os.path.join(settings_module.MEDIA_ROOT, ".uploads")
+        os.makedirs(uploads)
+        with open(os.path.join(uploads, "part"), "wb") as file:
+            file.write(b"partial upload")
+        for path in (".uploads/part", "posters/.hidden.jpg"):
+            response = self.client.get(reverse("media", args=[path]))
+            self.assertEqual(response.status_code, 404)
+
+
+class UniqueTitleTests(TestCase):
+    movie_data = BulkTests.movie_data
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "unique@example.com", "password", username="unique"
+            )
+        )
+        self.url = reverse("movies")
+
+    def test_titles_are_unique_ignoring_case_and_spaces(self):
+        movie = create_movie("Alpha")
+        response = self.client.post(self.url, self.movie_data(" alpha "), format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"title": ["This movie already exists"]})
+        self.assertEqual(Movie.objects.count(), 1)
+
+        # keeping its own title is not a duplicate
+        url = reverse("movie", args=[movie.id])
+        response = self.client.put(url, self.movie_data("Alpha"), format="json")
+        self.assertEqual(response.status_code, 202)
+
+    def test_create_does_not_look_up_the_title(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.movie_data("Alpha"), format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(
+            [query for query in queries if query["sql"].startswith("SELECT")]
+        )
+
+    def test_async_create_reports_duplicates_as_field_errors(self):
+        create_movie("Alpha")
+        token = AccessToken.for_user(get_user_model().objects.get())
+        response = self.client_class().post(
+            reverse("async-movies"),
+            self.movie_data("ALPHA"),
+            content_type="application/json",
+            headers={"Authorization": f"JWT {token}"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"title": ["This movie already exists"]})
+
+    def test_bulk_compares_normalized_titles(self):
+        create_movie("Alpha")
+        items = [self.movie_data("alpha "), self.movie_data("Beta"), self.movie_data("BETA")]
+        response = self.client.post(self.url, items, format="json")
+        statuses = [result["status"] for result in response.json()]
+        self.assertEqual(statuses, [400, 201, 400])
+
+    def test_bulk_create_survives_concurrent_duplicates(self):
+        items = [self.movie_data("Alpha"), self.movie_data("Beta")]
+        # another request inserted Alpha after the duplicate check
+        with mock.patch.object(MovieList, "find_bulk_duplicates", return_value={}):
+            create_movie("ALPHA")
+            response = self.client.post(self.url, items, format="json")
+        statuses = [result["status"] for result in response.json()]
+        self.assertEqual(statuses, [400, 201])
+        self.assertEqual(Movie.objects.count(), 2)
+
+
+class PartialUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "patch@example.com", "password", username="patch"
+            )
+        )
+        self.movie = create_movie("Alpha", backdrop="")
+        self.url = reverse("movie", args=[self.movie.id])
+
+    def test_patch_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                self.url, {"overview": "New", "title": "Alpha"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["overview"], "New")
+        updates = [query["sql"] for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"overview"', updates[0])
+        self.assertNotIn('"title"', updates[0])
+        self.assertNotIn('"poster"', updates[0])
+
+        # nothing changed, nothing written
+        updated_at = Movie.objects.get().updated_at
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {"overview": "New"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if q["sql"].startswith("UPDATE")])
+        self.assertEqual(Movie.objects.get().updated_at, updated_at)
+
+    def test_same_image_is_not_rewritten(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8), "blue").save(buffer, "PNG")
+        poster = base64.b64encode(buffer.getvalue()).decode()
+        self.client.patch(self.url, {"poster": poster}, format="json")
+        name = Movie.objects.get().poster.name
+        self.assertNotEqual(name, "posters/corbata.jpg")
+        self.client.patch(self.url, {"poster": poster}, format="json")
+        self.assertEqual(Movie.objects.get().poster.name, name)
+
+    def test_preconditions(self):
+        etag = self.client.patch(self.url, {}, format="json")["ETag"]
+        response = self.client.patch(
+            self.url, {"overview": "First"}, format="json", headers={"If-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        # the first write changed the version
+        response = self.client.patch(
+            self.url, {"overview": "Second"}, format="json", headers={"If-Match": etag}
+        )
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Movie.objects.get().overview, "First")
+
+        response = self.client.patch(
+            self.url,
+            {"overview": "Second"},
+            format="json",
+            headers={"If-Unmodified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+        self.assertEqual(response.status_code, 412)
+
+    def test_concurrent_conditional_patches_do_not_lose_updates(self):
+        etag = self.client.patch(self.url, {}, format="json")["ETag"]
+        responses = []
+        preconditions_pass = MovieOperations.preconditions_pass
+
+        def interleave(view, request, obj):
+            passed = preconditions_pass(view, request, obj)
+            if not responses:
+                # the other client holding the same ETag writes in between
+                responses.append(None)
+                responses[0] = self.client.patch(
+                    self.url,
+                    {"overview": "Second"},
+                    format="json",
+                    headers={"If-Match": etag},
+                )
+            return passed
+
+        with mock.patch.object(MovieOperations, "preconditions_pass", interleave):
+            response = self.client.patch(
+                self.url,
+                {"overview": "First"},
+                format="json",
+                headers={"If-Match": etag},
+            )
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Movie.objects.get().overview, "Second")
+
+
+def clear_view_cache():
+    # drop the cached responses, list ETags still need the same generation
+    generation = get_cache_generation(Movie)
+    cache.clear()
+    cache.set(_cache_tag_key(Movie), generation, None)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.movie = create_movie("Alpha", backdrop="")
+
+    def test_detail_answers_not_modified(self):
+        url = reverse("movie", args=[self.movie.id])
+        response = self.client.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        # the cached response carries the same validators
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        response = self.client.get(url, headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, 304)
+
+        # without the cache, 304 comes before serialization
+        cache.clear()
+        with mock.patch.object(MovieSerializer, "to_representation") as serialize:
+            response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        serialize.assert_not_called()
+
+        self.movie.overview = "Changed"
+        self.movie.save()
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_etag_follows_filtered_set(self):
+        url = reverse("movies")
+        etag = self.client.get(url)["ETag"]
+        clear_view_cache()
+        with mock.patch.object(MovieSerializer, "to_representation") as serialize:
+            response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        serialize.assert_not_called()
+
+        create_movie("Beta", backdrop="")
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        # a soft delete changes the latest updated_at
+        self.movie.is_active = False
+        self.movie.save()
+        response = self.client.get(url, {"active": "true"}, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_list_etag_changes_after_soft_delete_without_exact_count(self):
+        create_movie("Beta", backdrop="")
+        url = reverse("movies")
+        params = {"active": "true", "count": "cached"}
+        etag = self.client.get(url, params)["ETag"]
+        clear_view_cache()
+        response = self.client.get(url, params, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        # the oldest movie leaves the set, its latest updated_at stays the same
+        self.movie.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.save()
+        response = self.client.get(url, params, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_list_without_exact_count_does_not_scan_for_validators(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("movies"), {"pagination": "cursor", "count": "none"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ETag", response)
+        self.assertFalse(
+            [query for query in queries if "MAX(" in query["sql"].upper()]
+        )
+
+    def test_empty_list_has_etag(self):
+        response = self.client.get(reverse("movies"), {"query": "nothing"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    async def test_async_views_answer_not_modified(self):
+        for url in (
+            reverse("async-movies"),
+            reverse("async-movie", args=[self.movie.id]),
+        ):
+            etag = (await self.async_client.get(url))["ETag"]
+            clear_view_cache()
+            response = await self.async_client.get(url, headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+
+
+def get_sample(name, text=None):
+    # current value of one rendered sample, 0 before it was first observed
+    if text is None:
+        text = metrics.render()
+    for line in text.splitlines():
+        sample, _space, value = line.rpartition(" ")
+        if sample == name:
+            return float(value)
+    return 0
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_movie("Alpha", backdrop="")
+        create_movie("Beta", backdrop="")
+
+    def test_requests_are_measured_by_cache_result(self):
+        labels = '{view="movies",method="GET",cache="%s"}'
+        misses = get_sample("http_request_duration_seconds_count" + labels % "miss")
+        hits = get_sample("http_request_duration_seconds_count" + labels % "hit")
+        queries = get_sample('http_request_db_queries_sum{view="movies",cache="miss"}')
+        hit_queries = get_sample('http_request_db_queries_sum{view="movies",cache="hit"}')
+        serializer = get_sample(
+            'http_request_serializer_duration_seconds_sum{view="movies",cache="miss"}'
+        )
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse("movies"))
+        # the next request resets the captured queries
+        miss_queries = len(captured)
+        self.client.get(reverse("movies"))
+
+        self.assertEqual(
+            get_sample("http_request_duration_seconds_count" + labels % "miss"), misses + 1
+        )
+        self.assertEqual(
+            get_sample("http_request_duration_seconds_count" + labels % "hit"), hits + 1
+        )
+        self.assertEqual(
+            get_sample('http_request_db_queries_sum{view="movies",cache="miss"}'),
+            queries + miss_queries,
+        )
+        self.assertEqual(
+            get_sample('http_request_db_queries_sum{view="movies",cache="hit"}'),
+            hit_queries,
+        )
+        self.assertGreater(
+            get_sample(
+                'http_request_serializer_duration_seconds_sum{view="movies",cache="miss"}'
+            ),
+            serializer,
+        )
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("movies"))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE http_request_duration_seconds histogram", response.content.decode())
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.1"]):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+    def test_metrics_endpoint_adds_up_workers(self):
+        self.client.get(reverse("movies"))
+        name = (
+            'http_request_duration_seconds_count{view="movies",method="GET",cache="miss"}'
+        )
+        own = get_sample(name)
+        # another worker published the same values
+        metrics.publish()
+        cache.set("metrics-worker-other", metrics.snapshot(), 60)
+        workers = cache.get(metrics.WORKERS_KEY)
+        cache.set(metrics.WORKERS_KEY, {**workers, "other": time.time()}, None)
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(get_sample(name, response.content.decode()), own * 2)
+
+        cache.delete("metrics-worker-other")
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(get_sample(name, response.content.decode()), own)
+
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertNoLogs("core.slow_requests"):
+            self.client.get(reverse("movies"))
+        cache.clear()
+        with override_settings(SLOW_REQUEST_THRESHOLD=0), self.assertLogs(
+            "core.slow_requests", "WARNING"
+        ) as logs:
+            self.client.get(reverse("movies"), {"order": "title"})
+        self.assertIn("GET /api/movies/?order=title (200)", logs.output[0])
+        self.assertIn('FROM "movies_movie"', logs.output[0])
+
+
+class SeedTests(TestCase):
+    def test_seeded_movies_are_unique_searchable_and_repeatable(self):
+        self.assertEqual(seed_movies(30, start=len(TITLES) - 10), 30)
+        titles = list(Movie.objects.values_list("title", flat=True))
+        self.assertEqual(len(set(titles)), 30)
+        self.assertIn(f"{TITLES[0]} 2", titles)
+        first = [movie.overview for movie in generate_movies(5)]
+        self.assertEqual([movie.overview for movie in generate_movies(5)], first)
+
+        noun = TITLES[len(TITLES) - 1].split()[-1]
+        response = APIClient().get(reverse("movies"), {"query": noun})
+        self.assertGreater(response.json()["count"], 0)
+
+
+class LoadMoviesTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # no artwork, commits are real here and would build variants
+        create_movie("Existing", poster="", backdrop="")
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", newline="") as file:
+            file.write(content)
+        return path
+
+    def test_csv_and_ndjson_are_imported(self):
+        catalog = self.write(
+            "catalog.csv",
+            "title,overview,release_date,popularity,vote_average,poster\n"
+            'Quoted,"two\nlines",2020-01-02,3.5,7,\n'
+            "Broken,x,not a date,1,1,\n"
+            " existing ,duplicate,2020-01-02,1,1,\n",
+        )
+        extra = self.write(
+            "extra.ndjson",
+            json.dumps(
+                {
+                    "title": "Streamed",
+                    "release_date": "2021-05-05",
+                    "popularity": 2,
+                    "vote_average": 5,
+                    "poster": "posters/dyRUHEh.webp",
+                }
+            )
+            + "\n\n{broken\n",
+        )
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command(
+            "load_movies", catalog, extra, workers=1, stdout=stdout, stderr=stderr
+        )
+        self.assertIn("Loaded 2 movies", stdout.getvalue())
+        self.assertIn("1 duplicates and 2 invalid rows skipped", stdout.getvalue())
+        self.assertIn("catalog.csv row 2: ValueError", stderr.getvalue())
+        self.assertIn("extra.ndjson row 3: JSONDecodeError", stderr.getvalue())
+
+        quoted = Movie.objects.get(title="Quoted")
+        self.assertEqual(quoted.overview, "two\nlines")
+        self.assertEqual(quoted.poster.name, "posters/corbata.jpg")
+        self.assertEqual(quoted.original_title, "Quoted")
+        streamed = Movie.objects.get(title="Streamed")
+        self.assertEqual(streamed.poster.name, "posters/dyRUHEh.webp")
+        response = APIClient().get(reverse("movies"), {"query": "streamed"})
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_generated_movies_are_parsed_in_workers(self):
+        stdout = io.StringIO()
+        call_command(
+            "load_movies", generate=120, batch_size=50, workers=2, stdout=stdout
+        )
+        self.assertIn("Loaded 120 movies", stdout.getvalue())
+        self.assertEqual(Movie.objects.count(), 121)
+        # same indexes again, every title exists already
+        call_command(
+            "load_movies",
+            generate=10,
+            start=1,
+            workers=1,
+            no_placeholders=True,
+            stdout=stdout,
+        )
+        self.assertIn("Loaded 0 movies", stdout.getvalue())
+
+    def get_synchronous(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            return cursor.fetchone()[0]
+
+    def test_load_pragmas_are_applied_then_restored(self):
+        before = self.get_synchronous()
+        self.assertNotEqual(before, 0)
+        during = []
+
+        def insert(*args, **kwargs):
+            during.append(self.get_synchronous())
+            return insert_movies(*args, **kwargs)
+
+        with mock.patch(
+            "apps.movies.management.commands.load_movies.insert_movies", insert
+        ):
+            call_command(
+                "load_movies",
+                generate=3,
+                no_placeholders=True,
+                workers=1,
+                stdout=io.StringIO(),
+            )
+        # OFF while loading, outside of any transaction here
+        self.assertEqual(during, [0])
+        self.assertEqual(self.get_synchronous(), before)
+        self.assertEqual(Movie.objects.count(), 4)
+
+    def test_placeholders_can_be_left_out(self):
+        call_command(
+            "load_movies",
+            generate=3,
+            no_placeholders=True,
+            workers=1,
+            stdout=io.StringIO(),
+        )
+        movie = Movie.objects.exclude(title="Existing").first()
+        self.assertEqual(movie.poster.name, "")
+        self.assertEqual(movie.backdrop.name, "")
+
+
+class SQLiteProfileTests(TestCase):
+    def test_pragmas_are_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            for pragma, expected in [
+                ("synchronous", 1),
+                ("temp_store", 2),
+                ("busy_timeout", settings_module.SQLITE_PRAGMAS["busy_timeout"]),
+                ("cache_size", settings_module.SQLITE_PRAGMAS["cache_size"]),
+            ]:
+                cursor.execute(f"PRAGMA {pragma}")
+                self.assertEqual(cursor.fetchone()[0], expected, pragma)
+        self.assertNotIn("pragmas", connection.get_connection_params())
+
+    def test_file_databases_switch_to_wal(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {
+            **connection.settings_dict,
+            "NAME": os.path.join(directory.name, "db.sqlite3"),
+        }
+        wrapper = type(connections["default"])(settings_dict, alias="profile")
+        connections["profile"] = wrapper
+        self.addCleanup(delattr, connections._connections, "profile")
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+        with CaptureQueriesContext(wrapper) as queries:
+            with transaction.atomic(using="profile"):
+                pass
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
+
+    def test_bench_sqlite_reports_both_profiles(self):
+        stdout = io.StringIO()
+        call_command(
+            "bench_sqlite",
+            rows=200,
+            readers=1,
+            writers=1,
+            seconds=0.2,
+            json=True,
+            stdout=stdout,
+        )
+        results = json.loads(stdout.getvalue())
+        self.assertEqual(set(results), {"rollback", "tuned"})
+        self.assertGreater(results["tuned"]["reads"], 0)
+        self.assertGreater(results["tuned"]["writes"], 0)
+
+
+@override_settings(DATABASE_REPLICA_ALIASES=["replica"])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        self.user = get_user_model().objects.create_user(
+            "replica@example.com", "password", username="replica"
+        )
+
+    def db_for_read(self, request, model=Movie):
+        token = current_request.set(request)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            current_request.reset(token)
+
+    def test_safe_requests_read_from_replicas(self):
+        self.assertEqual(self.db_for_read(self.factory.get("/")), "replica")
+        self.assertEqual(self.db_for_read(self.factory.post("/")), "default")
+        # commands and threads outside a request
+        self.assertEqual(self.router.db_for_read(Movie), "default")
+        self.assertEqual(self.router.db_for_write(Movie), "default")
+        with override_settings(DATABASE_REPLICA_ALIASES=[]):
+            self.assertEqual(self.db_for_read(self.factory.get("/")), "default")
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        request = self.factory.patch("/")
+        request.user = self.user
+        stick_to_primary(request)
+
+        request = self.factory.get("/")
+        request.user = self.user
+        self.assertEqual(self.db_for_read(request), "default")
+        other = get_user_model().objects.create_user(
+            "other@example.com", "password", username="other"
+        )
+        request = self.factory.get("/")
+        request.user = other
+        self.assertEqual(self.db_for_read(request), "replica")
+
+    def test_lazy_users_are_not_loaded(self):
+        request = self.factory.get("/")
+        request.user = SimpleLazyObject(lambda: self.fail("user was loaded"))
+        self.assertEqual(self.db_for_read(request), "replica")
+
+    def test_middleware_sticks_after_unsafe_requests(self):
+        movie = create_movie("Alpha", poster="", backdrop="")
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse("movie", args=[movie.id])
+        # without a replica database behind the alias
+        with override_settings(DATABASE_REPLICA_ALIASES=[]):
+            client.get(url)
+            self.assertIsNone(cache.get(f"db-primary-{self.user.pk}"))
+            client.patch(url, {"overview": "New"}, format="json")
+        self.assertTrue(cache.get(f"db-primary-{self.user.pk}"))
+        self.assertIsNone(current_request.get())
+
+
+class ReplicaLagTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # a second SQLite file standing in for a replica, refreshed on demand
+        self.replica_path = os.path.join(directory.name, "replica.sqlite3")
+        settings_dict = {**connection.settings_dict, "NAME": self.replica_path}
+        wrapper = type(connections["default"])(settings_dict, alias="replica")
+        connections["replica"] = wrapper
+        self.addCleanup(delattr, connections._connections, "replica")
+        self.addCleanup(wrapper.close)
+        user_model = get_user_model()
+        self.writer, self.reader = APIClient(), APIClient()
+        self.writer.force_authenticate(
+            user_model.objects.create_user("writer@example.com", "pw", username="writer")
+        )
+        self.reader.force_authenticate(
+            user_model.objects.create_user("reader@example.com", "pw", username="reader")
+        )
+
+    def replicate(self):
+        connections["default"].ensure_connection()
+        target = sqlite3.connect(self.replica_path)
+        try:
+            connections["default"].connection.backup(target)
+        finally:
+            target.close()
+
+    def test_lagging_replica_reads_are_not_cached(self):
+        movie = create_movie("Alpha", poster="", backdrop="")
+        url = reverse("movie", args=[movie.id])
+        self.replicate()
+        bypassed = get_sample(
+            'http_request_duration_seconds_count{view="movie",method="GET",cache="bypass"}'
+        )
+        with override_settings(DATABASE_REPLICA_ALIASES=["replica"]):
+            self.assertEqual(self.reader.get(url).json()["overview"], "Overview")
+            self.writer.patch(url, {"overview": "New"}, format="json")
+
+            # the replica did not catch up yet, the writer reads the primary
+            self.assertEqual(self.reader.get(url).json()["overview"], "Overview")
+            self.assertEqual(self.writer.get(url).json()["overview"], "New")
+            self.assertEqual(
+                get_sample(
+                    'http_request_duration_seconds_count'
+                    '{view="movie",method="GET",cache="bypass"}'
+                ),
+                bypassed + 1,
+            )
+
+            # the stale read was not cached under the new version
+            self.replicate()
+            self.assertEqual(self.reader.get(url).json()["overview"], "New")
+
+            # once replicas caught up, their reads are cached again
+            cache.delete(f"cache-written-{Movie._meta.label_lower}")
+            with CaptureQueriesContext(connections["replica"]) as queries:
+                self.reader.get(url)
+                self.reader.get(url)
+            self.assertEqual(len(queries), 1)
+
+    async def test_async_search_reads_replicas_outside_the_event_loop(self):
+        await sync_to_async(create_movie)("Alpha", poster="", backdrop="")
+        await sync_to_async(self.replicate)()
+        user = await sync_to_async(get_user_model().objects.get)(username="reader")
+        headers = {"Authorization": f"JWT {AccessToken.for_user(user)}"}
+        # the router is sync only, as with a cache backed by a database
+        use_primary = mock.patch(
+            "core.routers.use_primary", async_unsafe(use_primary_sync)
+        )
+        with override_settings(DATABASE_REPLICA_ALIASES=["replica"]), use_primary:
+            response = await self.async_client.get(
+                reverse("async-movies"), {"query": "alpha"}, headers=headers
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+
+
+class TitleMigrationTests(TransactionTestCase):
+    migrate_from = [("movies", "0005_movie_image_variants")]
+    migrate_to = [("movies", "0006_movie_title_unique")]
+
+    def tearDown(self):
+        # back to the latest schema for the next tests
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_are_renamed_and_reindexed(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        old_apps = executor.loader.project_state(self.migrate_from).apps
+        data = {
+            "overview": "Overview",
+            "release_date": datetime.date(2024, 1, 1),
+            "original_title": "Alpha",
+            "original_language": "en",
+            "popularity": 1.0,
+            "vote_average": 5.0,
+        }
+        old_movie = old_apps.get_model("movies", "Movie")
+        first = old_movie.objects.create(title="Alpha", **data)
+        second = old_movie.objects.create(title=" ALPHA", **data)
+        with connection.cursor() as cursor:
+            # flushes of earlier tests leave the virtual table alone
+            cursor.execute('DELETE FROM "movies_movie_fts"')
+            cursor.execute(
+                'INSERT INTO "movies_movie_fts" (rowid, "object_id", "title", '
+                '"original_title", "overview") SELECT rowid, "id", "title", '
+                '"original_title", "overview" FROM "movies_movie"'
+            )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT "title" FROM "movies_movie_fts" WHERE "object_id" = %s',
+                [second.id.hex],
+            )
+            indexed = cursor.fetchone()[0]
+        renamed = Movie.objects.values_list("title", flat=True).get(pk=second.pk)
+        self.assertEqual(renamed, "ALPHA (2)")
+        self.assertEqual(indexed, renamed)
+        self.assertEqual(Movie.objects.get(pk=first.pk).title, "Alpha")
@@ -0,0 +1,152 @@
+import os
+import tempfile
+
+import filetype
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import serializers, status
+from rest_framework.parsers import MultiPartParser
+
+
+def get_upload_temp_dir():
+    # same filesystem as MEDIA_ROOT, saving the upload is a rename
+    path = os.path.join(settings.MEDIA_ROOT, ".uploads")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class MediaUploadedFile(TemporaryUploadedFile):
+    """
+    TemporaryUploadedFile written under MEDIA_ROOT instead of FILE_UPLOAD_TEMP_DIR
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        _root, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(
+            suffix=".upload" + ext, dir=get_upload_temp_dir()
+        )
+        super(TemporaryUploadedFile, self).__init__(
+            file, name, content_type, size, charset, content_type_extra
+        )
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Stream uploaded files to disk chunk by chunk, never holding one in memory \n
+    the type is sniffed from the first chunk and the size checked on every
+    chunk, the upload stops at the first violation and error is set
+    """
+
+    def __init__(self, request=None, max_size=None, content_types=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.ARTWORK_MAX_UPLOAD_SIZE
+        self.content_types = content_types or settings.ARTWORK_CONTENT_TYPES
+        self.error = None
+        self.file = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.file = MediaUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0:
+            kind = filetype.guess(raw_data)
+            if kind is None or kind.mime not in self.content_types:
+                self.abort(
+                    status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    _(f"Unsupported image type, use one of {', '.join(self.content_types)}"),
+                )
+            # trust the sniffed type, not the one sent by the client
+            self.file.content_type = kind.mime
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.abort(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                _(f"Image is larger than {self.max_size} bytes"),
+            )
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def abort(self, code, detail):
+        self.error = (code, detail)
+        self.discard()
+        # leave the rest of the body unread
+        raise StopUpload(connection_reset=True)
+
+    def discard(self):
+        # the parser closes handler.file after a StopUpload, keep it set
+        if self.file is not None:
+            self.file.close()
+
+
+class ArtworkSerializer(serializers.Serializer):
+    # Pillow opens the file from its temporary path to check it is an image
+    file = serializers.ImageField()
+
+
+class MixinUpload:
+    model = None
+    class_serializer = None
+    upload_fields = ()
+    upload_handler_class = ImageUploadHandler
+    # room for multipart boundaries and part headers around the file
+    upload_overhead = 16 * 1024
+    parser_classes = [MultiPartParser]
+
+    def put(self, request, id, field):
+        """
+        Replace one image of one object by his id, sent as multipart/form-data
+        in a "file" part \n
+        the file is streamed to disk and moved into place, never decoded in memory
+        """
+        if field not in self.upload_fields:
+            return JsonResponse(
+                {"detail": _(f"{field} is not an image of {self.model.__name__}")},
+                safe=False,
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        obj = get_object_or_404(self.model, id=id)
+
+        handler = self.upload_handler_class(request._request)
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        if content_length > handler.max_size + self.upload_overhead:
+            return JsonResponse(
+                {"detail": _(f"Image is larger than {handler.max_size} bytes")},
+                safe=False,
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        # must be set before the body is read
+        request._request.upload_handlers = [handler]
+
+        serializer = ArtworkSerializer(data=request.FILES)
+        if handler.error:
+            code, detail = handler.error
+            return JsonResponse({"detail": detail}, safe=False, status=code)
+        if not serializer.is_valid():
+            return JsonResponse(
+                serializer.errors, safe=False, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        upload = serializer.validated_data["file"]
+        getattr(obj, field).save(upload.name, upload, save=False)
+        upload.close()
+        obj.save(update_fields=[field, "updated_at"])
+        return JsonResponse(
+            self.class_serializer(obj).data, safe=False, status=status.HTTP_202_ACCEPTED
+        )
@@ -4,5 +4,13 @@ from .views import *
 
 urlpatterns = [
     path("movies/", MovieList.as_view(), name="movies"),
+    path("movies/export/", MovieExport.as_view(), name="movies-export"),
     path("movie/<uuid:id>/", MovieOperations.as_view(), name="movie"),
+    path(
+        "movie/<uuid:id>/artwork/<str:field>/",
+        MovieArtwork.as_view(),
+        name="movie-artwork",
+    ),
+    path("async/movies/", AsyncMovieList.as_view(), name="async-movies"),
+    path("async/movie/<uuid:id>/", AsyncMovieOperations.as_view(), name="async-movie"),
 ]
\ No newline at end of file
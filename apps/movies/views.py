@@ -1,22 +1,49 @@
 from django.http import JsonResponse
 from django.shortcuts import render
+from django.db.models.functions import Lower, Trim
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.permissions import BasePermission, IsAdminUser, IsAuthenticated
 
-from .models import Movie
+from .models import Movie, normalize_title
 from .serializers import MovieSerializer
-from .mixins import MixinsList, MixinOperations
+from .mixins import MixinsList, MixinsExport, MixinOperations
+from .async_mixins import AsyncAPIView, AsyncMixinsList, AsyncMixinOperations
+from .uploads import MixinUpload
 
 
 class MovieList(APIView, MixinsList):
     model = Movie
     class_serializer = MovieSerializer
     permission_post = IsAuthenticated   
+    permission_put = IsAuthenticated
+    permission_delete = IsAuthenticated
+    bulk_unique_fields = ["title"]
+    bulk_unique_normalized = {"title": (Lower(Trim("title")), normalize_title)}
+
+class MovieExport(APIView, MixinsExport):
+    model = Movie
+    class_serializer = MovieSerializer
 
 class MovieOperations(APIView, MixinOperations):
     model = Movie
     class_serializer = MovieSerializer
     permission_post = IsAuthenticated
     permission_put = IsAuthenticated
-    permission_delete = IsAuthenticated
\ No newline at end of file
+    permission_patch = IsAuthenticated
+    permission_delete = IsAuthenticated
+
+class MovieArtwork(MixinUpload, APIView):
+    # mixin first, its parser_classes must win over the APIView defaults
+    model = Movie
+    class_serializer = MovieSerializer
+    permission_classes = [IsAuthenticated]
+    upload_fields = Movie.image_variant_fields
+
+class AsyncMovieList(AsyncAPIView, AsyncMixinsList):
+    model = Movie
+    class_serializer = MovieSerializer
+
+class AsyncMovieOperations(AsyncAPIView, AsyncMixinOperations):
+    model = Movie
+    class_serializer = MovieSerializer
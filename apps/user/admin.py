@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.hashers import identify_hasher
 from .models import UserAccount
 
 
@@ -50,7 +51,12 @@ class UserAccountAdmin(BaseUserAdmin):
     ordering = ("email",)
 
     def save_model(self, request, obj, form, change):
-        obj.set_password(obj.password)
+        # the forms already hash, only hash a password typed in clear
+        if obj.has_usable_password():
+            try:
+                identify_hasher(obj.password)
+            except ValueError:
+                obj.set_password(obj.password)
         obj.save()
 
 
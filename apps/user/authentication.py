@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.cache import bump_generations, get_generation
+
+
+def _user_version_key(user_id):
+    return f"jwt-user-version-{user_id}"
+
+
+def get_user_version(user_id):
+    """
+    Return the current version of the cached record of user_id, see core.cache
+    """
+    return get_generation(_user_version_key(user_id))
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached record of user_id, bumping its version once the current
+    transaction commits
+    """
+    bump_generations([_user_version_key(user_id)])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication keeping the user record in the cache, keyed by user id
+    and version, instead of loading it on every request \n
+    the version is bumped when the user is saved (password changes included)
+    or one of his tokens is blacklisted, see apps.user.signals \n
+    only cached_fields are kept, the password never leaves the database, other
+    fields are deferred and loaded on first access
+    """
+
+    cached_fields = (
+        "id", "email", "username", "is_active", "is_staff", "is_superuser", "role",
+        "verified",
+    )
+
+    def dump_user(self, user):
+        record = {field: getattr(user, field) for field in self.cached_fields}
+        if api_settings.CHECK_REVOKE_TOKEN:
+            record["password_hash"] = get_md5_hash_password(user.password)
+        return record
+
+    def load_user(self, record):
+        # from_db takes the values in the order of the model fields
+        fields = [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname in self.cached_fields
+        ]
+        values = [record[field] for field in fields]
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, fields, values)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = f"jwt-user-{user_id}-{get_user_version(user_id)}"
+        record = cache.get(key)
+        if record is None:
+            # loads the user and checks it is active and the password unchanged
+            user = super().get_user(validated_token)
+            cache.set(key, self.dump_user(user), settings.JWT_USER_CACHE_TIMEOUT)
+            return user
+
+        user = self.load_user(record)
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != record.get(
+                "password_hash"
+            ):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        return user
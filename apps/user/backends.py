@@ -0,0 +1,40 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+
+class BoundedModelBackend(ModelBackend):
+    """
+    ModelBackend letting at most PASSWORD_HASH_CONCURRENCY password checks run
+    at once per process, so a burst of logins can not take every worker
+    thread and core from the rest of the API \n
+    waits PASSWORD_HASH_TIMEOUT seconds for a slot, then denies the login:
+    authenticate() returns None (admin and session logins show their usual
+    error) and request.login_throttled tells the API to answer 429
+    """
+
+    semaphore = None
+    semaphore_lock = threading.Lock()
+
+    @classmethod
+    def get_semaphore(cls):
+        with cls.semaphore_lock:
+            if cls.semaphore is None:
+                cls.semaphore = threading.BoundedSemaphore(
+                    settings.PASSWORD_HASH_CONCURRENCY
+                )
+        return cls.semaphore
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        semaphore = self.get_semaphore()
+        if not semaphore.acquire(timeout=settings.PASSWORD_HASH_TIMEOUT):
+            if request is not None:
+                request.login_throttled = True
+            # stops authenticate() from trying the next backends
+            raise PermissionDenied()
+        try:
+            return super().authenticate(request, username, password, **kwargs)
+        finally:
+            semaphore.release()
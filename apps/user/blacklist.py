@@ -0,0 +1,83 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenRefreshSerializer,
+    TokenVerifySerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+def _blacklist_key(jti):
+    return f"jwt-blacklist-{jti}"
+
+
+def mark_blacklisted(jti, exp):
+    """
+    Remember jti as blacklisted until the token expires, exp in epoch seconds
+    """
+    cache.set(_blacklist_key(jti), True, max(1, int(exp - time.time())))
+
+
+def is_blacklisted(jti, exp):
+    """
+    Check jti against the cached blacklist, the database is only read on a miss \n
+    blacklisted tokens stay cached until they expire, unknown ones for
+    JWT_BLACKLIST_NEGATIVE_TIMEOUT, blacklisting overwrites both
+    """
+    key = _blacklist_key(jti)
+    blacklisted = cache.get(key)
+    if blacklisted is None:
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if blacklisted:
+            mark_blacklisted(jti, exp)
+        else:
+            cache.set(key, False, settings.JWT_BLACKLIST_NEGATIVE_TIMEOUT)
+    return blacklisted
+
+
+def prune_expired_tokens():
+    """
+    Delete outstanding tokens past their expiry, their blacklist rows go
+    with them \n
+    run by manage.py prune_tokens, returns the number of deleted rows
+    """
+    deleted, _rows = OutstandingToken.objects.filter(
+        expires_at__lte=aware_utcnow()
+    ).delete()
+    return deleted
+
+
+class CachedRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload["exp"]):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class CachedTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer checking the blacklist through the cache
+    """
+
+    token_class = CachedRefreshToken
+
+
+class CachedTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+        if api_settings.BLACKLIST_AFTER_ROTATION and is_blacklisted(
+            token.get(api_settings.JTI_CLAIM), token["exp"]
+        ):
+            raise ValidationError(_("Token is blacklisted"))
+        return {}
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2PasswordHasher with its costs read from ARGON2_TIME_COST,
+    ARGON2_MEMORY_COST (KiB) and ARGON2_PARALLELISM \n
+    keeps the "argon2" algorithm name, hashes made with other costs still
+    verify and are rehashed with the current ones on the next login
+    """
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.user.hashers import TunableArgon2PasswordHasher
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure Argon2 hashes per second for candidate costs, on one core and "
+        "on every worker process, e.g.:\n"
+        "  manage.py bench_hashers --time-cost 1 2 3 --memory-cost 19456 65536"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--time-cost", type=int, nargs="+")
+        parser.add_argument("--memory-cost", type=int, nargs="+", help="KiB")
+        parser.add_argument("--parallelism", type=int, nargs="+")
+        parser.add_argument("-n", "--hashes", type=int, default=20)
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="processes hashing at once for the throughput column",
+        )
+        parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+    def handle(self, *args, **options):
+        candidates = product(
+            options["time_cost"] or [settings.ARGON2_TIME_COST],
+            options["memory_cost"] or [settings.ARGON2_MEMORY_COST],
+            options["parallelism"] or [settings.ARGON2_PARALLELISM],
+        )
+        hashes, workers = options["hashes"], options["workers"]
+        results = []
+        for params in candidates:
+            seconds = bench(params, hashes)
+            with ProcessPoolExecutor(workers) as pool:
+                start = time.perf_counter()
+                list(pool.map(bench, [params] * workers, [hashes] * workers))
+                elapsed = time.perf_counter() - start
+            time_cost, memory_cost, parallelism = params
+            results.append(
+                {
+                    "time_cost": time_cost,
+                    "memory_cost": memory_cost,
+                    "parallelism": parallelism,
+                    "ms_per_hash": round(seconds / hashes * 1000, 2),
+                    "hashes_per_second_per_core": round(hashes / seconds, 1),
+                    "hashes_per_second": round(workers * hashes / elapsed, 1),
+                    "workers": workers,
+                }
+            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results))
+            return
+        for result in results:
+            self.stdout.write(
+                "t={time_cost} m={memory_cost} p={parallelism}: "
+                "{ms_per_hash} ms/hash, {hashes_per_second_per_core}/s per core, "
+                "{hashes_per_second}/s on {workers} workers".format(**result)
+            )
+
+
+class BenchHasher(TunableArgon2PasswordHasher):
+    def __init__(self, time_cost, memory_cost, parallelism):
+        self.costs = (time_cost, memory_cost, parallelism)
+
+    time_cost = property(lambda self: self.costs[0])
+    memory_cost = property(lambda self: self.costs[1])
+    parallelism = property(lambda self: self.costs[2])
+
+
+def bench(params, hashes):
+    """
+    Seconds taken by hashes sequential hashes with costs params
+    """
+    hasher = BenchHasher(*params)
+    salt = hasher.salt()
+    start = time.perf_counter()
+    for index in range(hashes):
+        hasher.encode(f"password-{index}", salt)
+    return time.perf_counter() - start
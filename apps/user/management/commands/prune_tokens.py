@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.user.blacklist import prune_expired_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted JWTs so the token tables "
+        "stay small. Run once from cron or keep it running with --loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="keep pruning periodically"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="seconds between runs of --loop, JWT_BLACKLIST_PRUNE_INTERVAL "
+            "by default",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or settings.JWT_BLACKLIST_PRUNE_INTERVAL
+        while True:
+            deleted = prune_expired_tokens()
+            self.stdout.write(f"deleted {deleted} expired tokens")
+            if not options["loop"]:
+                return
+            time.sleep(interval)
@@ -2,7 +2,10 @@ from djoser.serializers import PasswordResetConfirmSerializer
 from djoser.serializers import UserCreateSerializer
 from urllib.parse import urlparse
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.conf import settings
+from django.utils.translation import gettext_lazy as _
 
 from django.contrib.auth import get_user_model
 
@@ -48,3 +51,20 @@ class CustomPasswordResetConfirmSerializer(PasswordResetConfirmSerializer):
     def build_password_reset_confirm_url(self, uid, token):
         url = f"?forgot_password_confirm=True&uid={uid}&token={token}"
         return url
+
+
+class BoundedTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    JWT login answering 429 when BoundedModelBackend found no free slot to
+    check the password
+    """
+
+    def validate(self, attrs):
+        try:
+            return super().validate(attrs)
+        except AuthenticationFailed:
+            if getattr(self.context.get("request"), "login_throttled", False):
+                raise Throttled(
+                    detail=_("Too many logins in progress, try again later.")
+                )
+            raise
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import invalidate_user
+from .blacklist import mark_blacklisted
+from .models import UserAccount
+
+
+@receiver([post_save, post_delete], sender=UserAccount)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklisted_user(sender, instance, **kwargs):
+    if instance.token.user_id is not None:
+        invalidate_user(instance.token.user_id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def cache_blacklisted_token(sender, instance, **kwargs):
+    mark_blacklisted(instance.token.jti, instance.token.expires_at.timestamp())
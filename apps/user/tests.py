@@ -1,3 +1,193 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.admin.sites import site
+from django.contrib.auth import authenticate
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from core.testing import use_test_cache
+
+from .authentication import CachedJWTAuthentication
+from .backends import BoundedModelBackend
+from .blacklist import prune_expired_tokens
+from .models import UserAccount
+
+
+def setUpModule():
+    use_test_cache()
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "password", username="user"
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"JWT {AccessToken.for_user(self.user)}")
+        # a write, never served from the view cache
+        self.url = reverse("movies")
+
+    def post(self):
+        return self.client.post(self.url, [], format="json")
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.post().status_code, 400)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post().status_code, 400)
+
+    def test_saving_the_user_evicts_it(self):
+        self.post()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.post().status_code, 401)
+
+    def test_password_is_not_cached(self):
+        self.post()
+        version = cache.get(f"jwt-user-version-{self.user.pk}")
+        record = cache.get(f"jwt-user-{self.user.pk}-{version}")
+        self.assertEqual(record["role"], "customer")
+        self.assertNotIn(self.user.password, repr(record))
+
+        request = RequestFactory().get("/")
+        request.META["HTTP_AUTHORIZATION"] = f"JWT {AccessToken.for_user(self.user)}"
+        with self.assertNumQueries(0):
+            user, _token = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual((user.pk, user.username), (self.user.pk, "user"))
+        # other fields are loaded on access
+        with self.assertNumQueries(1):
+            self.assertEqual(user.password, self.user.password)
+
+    def test_blacklisting_a_token_evicts_the_user(self):
+        self.post()
+        refresh = RefreshToken.for_user(self.user)
+        with self.assertNumQueries(0):
+            self.post()
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh.blacklist()
+        with self.assertNumQueries(1):
+            self.post()
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "password", username="user"
+        )
+        self.client = APIClient()
+
+    def test_rotated_refresh_token_is_rejected(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        response = self.client.post(reverse("jwt-refresh"), {"refresh": refresh})
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()["refresh"]
+
+        # the blacklist is answered by the cache
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("jwt-refresh"), {"refresh": refresh})
+        self.assertEqual(response.status_code, 401)
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("jwt-verify"), {"token": refresh})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse("jwt-verify"), {"token": rotated})
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("jwt-verify"), {"token": rotated})
+        self.assertEqual(response.status_code, 200)
+
+    def test_blacklist_survives_cache_loss(self):
+        refresh = RefreshToken.for_user(self.user)
+        refresh.blacklist()
+        cache.clear()
+        response = self.client.post(reverse("jwt-verify"), {"token": str(refresh)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_expired_tokens_are_pruned(self):
+        RefreshToken.for_user(self.user).blacklist()
+        OutstandingToken.objects.update(
+            expires_at=aware_utcnow() - datetime.timedelta(seconds=1)
+        )
+        refresh = RefreshToken.for_user(self.user)
+        # never on the refresh request itself
+        response = self.client.post(reverse("jwt-refresh"), {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+
+        stdout = io.StringIO()
+        call_command("prune_tokens", stdout=stdout)
+        self.assertIn("deleted 2 expired tokens", stdout.getvalue())
+        self.assertEqual(prune_expired_tokens(), 0)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+
+
+@override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=8192, ARGON2_PARALLELISM=1)
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "password", username="user"
+        )
+
+    def test_costs_come_from_settings(self):
+        self.assertIn("$m=8192,t=1,p=1$", self.user.password)
+
+    def test_password_is_rehashed_on_login_when_costs_change(self):
+        with override_settings(ARGON2_TIME_COST=2):
+            user = authenticate(email="user@example.com", password="password")
+        self.assertEqual(user, self.user)
+        self.user.refresh_from_db()
+        self.assertIn("$m=8192,t=2,p=1$", self.user.password)
+
+    def test_logins_wait_for_a_free_slot(self):
+        semaphore = threading.BoundedSemaphore(1)
+        semaphore.acquire()
+        with mock.patch.object(BoundedModelBackend, "semaphore", semaphore):
+            with override_settings(PASSWORD_HASH_TIMEOUT=0.01):
+                response = APIClient().post(
+                    reverse("jwt-create"),
+                    {"email": "user@example.com", "password": "password"},
+                )
+        self.assertEqual(response.status_code, 429)
+        response = APIClient().post(
+            reverse("jwt-create"), {"email": "user@example.com", "password": "password"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_session_logins_are_denied_while_busy(self):
+        semaphore = threading.BoundedSemaphore(1)
+        semaphore.acquire()
+        with mock.patch.object(BoundedModelBackend, "semaphore", semaphore):
+            with override_settings(PASSWORD_HASH_TIMEOUT=0.01):
+                request = RequestFactory().post("/")
+                self.assertIsNone(
+                    authenticate(request, email="user@example.com", password="password")
+                )
+                self.assertTrue(request.login_throttled)
+                response = self.client.post(
+                    reverse("admin:login"),
+                    {"username": "user@example.com", "password": "password"},
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors)
+
+    def test_admin_does_not_hash_twice(self):
+        request = RequestFactory().post("/")
+        model_admin = site._registry[UserAccount]
+        model_admin.save_model(request, self.user, None, True)
+        self.assertTrue(self.user.check_password("password"))
+        self.user.password = "secret"
+        model_admin.save_model(request, self.user, None, True)
+        self.assertTrue(self.user.check_password("secret"))
@@ -0,0 +1,45 @@
+"""
+Generations of cached data, shared by every worker through the default cache.
+
+A generation is part of the keys of the entries it versions, bumping it
+orphans every entry built before. Generations are timestamps: an evicted one
+never comes back with a value already used, and a bump sets a new timestamp
+instead of calling incr, a get and set on most backends that loses concurrent
+bumps. Bumps wait for the current transaction to commit, a read in between
+would cache the old rows under the new generation.
+"""
+
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_generation(key):
+    return cache.get_or_set(key, time.time_ns, None)
+
+
+async def aget_generation(key):
+    return await cache.aget_or_set(key, time.time_ns, None)
+
+
+def _set_generations(keys):
+    generation = time.time_ns()
+    cache.set_many({key: generation for key in keys}, None)
+
+
+def bump_generations(keys):
+    """
+    Move every generation of keys to a new one once the current transaction
+    commits
+    """
+    transaction.on_commit(partial(_set_generations, keys))
+
+
+def drop_generations(keys):
+    """
+    Forget every generation of keys once the current transaction commits \n
+    they restart from a new timestamp on next read
+    """
+    transaction.on_commit(partial(cache.delete_many, keys))
@@ -0,0 +1,172 @@
+"""
+Serve uploaded media with strong ETags, conditional GET and byte ranges.
+
+Image bytes never pass through Python: FileResponse lets the WSGI server
+sendfile() the open file, or the response only names the file for nginx
+(X-Accel-Redirect) or Apache (X-Sendfile) to send.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+re_range = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# variants are named after a hash of their source and never change
+re_immutable = re.compile(r"(^|/)variants/")
+
+
+@lru_cache(maxsize=4096)
+def get_etag(path, size, mtime_ns):
+    """
+    Strong ETag from the file content, hashed once per (path, size, mtime)
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive of a single "bytes=" range, None to send the whole
+    file, raises ValueError when the range can not be satisfied
+    """
+    match = re_range.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        # malformed and multipart ranges are ignored
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class FileRange:
+    """
+    Readable slice of an open file, keeps fileno() so servers can sendfile()
+    it, they stop at Content-Length
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def offload(mode, path, full_path):
+    # both servers decode the header, spaces, "%", "?" or non ASCII names
+    # would be cut or reinterpreted as they are
+    if mode == "x-accel-redirect":
+        response = HttpResponse()
+        location = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        response["X-Accel-Redirect"] = location
+        return response
+    response = HttpResponse()
+    response["X-Sendfile"] = quote(full_path)
+    return response
+
+
+@require_safe
+def serve(request, path):
+    """
+    Media files view, replaces django.views.static.serve \n
+    answers 304 to If-None-Match / If-Modified-Since, 206 to a single Range
+    and 416 to a range out of the file \n
+    hidden files and directories (as the .uploads of chunked uploads) are
+    never served
+    """
+    if any(part.startswith(".") for part in path.split("/")):
+        raise Http404()
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404()
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404()
+
+    etag = get_etag(full_path, stat_result.st_size, stat_result.st_mtime_ns)
+    last_modified = int(stat_result.st_mtime)
+    response = get_conditional_response(request, etag, last_modified)
+    if response is None:
+        mode = settings.MEDIA_SERVE_MODE
+        if mode in ("x-accel-redirect", "x-sendfile"):
+            # the front server answers ranges itself
+            response = offload(mode, path, full_path)
+        else:
+            response = serve_file(request, full_path, stat_result.st_size, etag)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if response.status_code in (200, 206):
+        # compressed files are sent as they are, not decoded by the client
+        if encoding or not content_type:
+            content_type = "application/octet-stream"
+        response["Content-Type"] = content_type
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    if re_immutable.search(path):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    return response
+
+
+def serve_file(request, full_path, size, etag):
+    byte_range = None
+    header = request.headers.get("Range")
+    # If-Range only keeps the range while the file is unchanged
+    if header and request.headers.get("If-Range", etag) == etag:
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    file = open(full_path, "rb")
+    if byte_range is None:
+        response = FileResponse(file)
+        response["Content-Length"] = size
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(FileRange(file, start, length), status=206)
+        response["Content-Length"] = length
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,192 @@
+"""
+Minimal in-process metrics rendered in the Prometheus text format.
+
+Values live in the memory of each worker process, which publishes a snapshot
+to the shared cache every METRICS_PUBLISH_INTERVAL seconds. The scrape
+endpoint adds up the snapshots of every live worker, whichever one answers.
+"""
+
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_safe
+
+
+registry = []
+WORKER = f"{socket.gethostname()}-{os.getpid()}"
+WORKERS_KEY = "metrics-workers"
+last_published = 0.0
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        registry.append(self)
+
+    def get_key(self, labels):
+        return tuple((name, labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self):
+        with self.lock:
+            return {key: self.copy_value(value) for key, value in self.values.items()}
+
+    def copy_value(self, value):
+        return value
+
+    def render(self, values=None):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        if values is None:
+            values = self.snapshot()
+        for key, value in values.items():
+            lines.extend(self.render_value(key, value))
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.get_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def merge_value(self, value, other):
+        return value + other
+
+    def render_value(self, key, value):
+        return [f"{self.name}_total{format_labels(key)} {value}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets or self.default_buckets))
+
+    def observe(self, value, **labels):
+        key = self.get_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0))
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def copy_value(self, value):
+        counts, total = value
+        return (list(counts), total)
+
+    def merge_value(self, value, other):
+        return ([a + b for a, b in zip(value[0], other[0])], value[1] + other[1])
+
+    def render_value(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            labels = format_labels(key + (("le", bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        lines.append(f"{self.name}_sum{format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{format_labels(key)} {cumulative}")
+        return lines
+
+
+def snapshot():
+    return {metric.name: metric.snapshot() for metric in registry}
+
+
+def publish():
+    """
+    Store the values of this worker in the shared cache, they expire unless
+    published again within a few intervals \n
+    the list of workers is rewritten by each of them, an entry lost to a
+    concurrent write comes back on the next publish
+    """
+    global last_published
+    last_published = time.monotonic()
+    timeout = settings.METRICS_PUBLISH_INTERVAL * 6
+    cache.set(f"metrics-worker-{WORKER}", snapshot(), timeout)
+    now = time.time()
+    workers = {
+        worker: seen
+        for worker, seen in (cache.get(WORKERS_KEY) or {}).items()
+        if seen > now - timeout
+    }
+    workers[WORKER] = now
+    cache.set(WORKERS_KEY, workers, None)
+
+
+def publish_is_due():
+    return time.monotonic() - last_published >= settings.METRICS_PUBLISH_INTERVAL
+
+
+def collect():
+    """
+    Values of every live worker added up, this worker counts with its current
+    values
+    """
+    workers = [worker for worker in cache.get(WORKERS_KEY) or {} if worker != WORKER]
+    snapshots = list(
+        cache.get_many([f"metrics-worker-{worker}" for worker in workers]).values()
+    )
+    snapshots.append(snapshot())
+    merged = {}
+    for metric in registry:
+        values = merged[metric.name] = {}
+        for worker_values in snapshots:
+            for key, value in worker_values.get(metric.name, {}).items():
+                values[key] = (
+                    metric.merge_value(values[key], value) if key in values else value
+                )
+    return merged
+
+
+def render(values=None):
+    """
+    Return every registered metric in the Prometheus text exposition format,
+    values default to the ones of this worker (see collect)
+    """
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render(None if values is None else values[metric.name]))
+    return "\n".join(lines) + "\n"
+
+
+@require_safe
+def metrics_view(request):
+    """
+    Scrape endpoint for all workers, only answers clients listed in
+    METRICS_ALLOWED_IPS (everyone when empty)
+    """
+    allowed = settings.METRICS_ALLOWED_IPS
+    if allowed and request.META.get("REMOTE_ADDR") not in allowed:
+        raise Http404()
+    return HttpResponse(
+        render(collect()), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,219 @@
+"""
+Per request timing and query accounting, exported through core.metrics, and
+the request context of the database router.
+
+Every database connection gets an execute wrapper that adds to the stats of
+the request running in the current context, the views report cache hits and
+serializer time the same way. SQL is only kept when the slow request log is
+enabled (SLOW_REQUEST_THRESHOLD).
+"""
+
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+from .metrics import Histogram
+from .routers import SAFE_METHODS, current_request, stick_to_primary
+
+logger = logging.getLogger("core.slow_requests")
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "time spent answering requests, by view and cache result",
+    ["view", "method", "cache"],
+)
+request_queries = Histogram(
+    "http_request_db_queries",
+    "database queries issued per request",
+    ["view", "cache"],
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+request_query_duration = Histogram(
+    "http_request_db_duration_seconds",
+    "time spent in database queries per request",
+    ["view", "cache"],
+)
+request_serializer_duration = Histogram(
+    "http_request_serializer_duration_seconds",
+    "time spent serializing objects per request",
+    ["view", "cache"],
+)
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_time", "serializer_time", "cache", "sql")
+
+    def __init__(self, keep_sql=False):
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+        self.cache = "none"
+        self.sql = [] if keep_sql else None
+
+
+request_stats = ContextVar("request_stats", default=None)
+
+
+def record_cache(result):
+    """
+    Note whether the response came from the view cache ("hit", "miss" or
+    "bypass")
+    """
+    stats = request_stats.get()
+    if stats is not None:
+        stats.cache = result
+
+
+def record_serializer_time(seconds):
+    stats = request_stats.get()
+    if stats is not None:
+        stats.serializer_time += seconds
+
+
+def record_query(execute, sql, params, many, context):
+    stats = request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats.queries += 1
+        stats.query_time += duration
+        if stats.sql is not None and len(stats.sql) < settings.SLOW_REQUEST_MAX_QUERIES:
+            stats.sql.append((duration, sql))
+
+
+def track_queries(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(track_queries)
+
+
+class PerformanceMiddleware:
+    """
+    Record latency, query count and time and serializer time of every
+    request, labelled by view name and cache result \n
+    requests slower than SLOW_REQUEST_THRESHOLD seconds are logged with their
+    SQL, None disables the log
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # connections opened before the middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            track_queries(connection=connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        self.finish(request, response, stats, started)
+        if metrics.publish_is_due():
+            metrics.publish()
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        self.finish(request, response, stats, started)
+        if metrics.publish_is_due():
+            # the cache may be a database one
+            await sync_to_async(metrics.publish)()
+        return response
+
+    def start(self):
+        stats = RequestStats(keep_sql=settings.SLOW_REQUEST_THRESHOLD is not None)
+        return stats, request_stats.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        request_duration.observe(
+            duration, view=view, method=request.method, cache=stats.cache
+        )
+        request_queries.observe(stats.queries, view=view, cache=stats.cache)
+        request_query_duration.observe(stats.query_time, view=view, cache=stats.cache)
+        request_serializer_duration.observe(
+            stats.serializer_time, view=view, cache=stats.cache
+        )
+
+        threshold = settings.SLOW_REQUEST_THRESHOLD
+        if threshold is not None and duration >= threshold:
+            logger.warning(
+                "Slow request %s %s (%s) %.3fs, %d queries in %.3fs, "
+                "serializer %.3fs, cache %s\n%s",
+                request.method,
+                request.get_full_path(),
+                response.status_code,
+                duration,
+                stats.queries,
+                stats.query_time,
+                stats.serializer_time,
+                stats.cache,
+                "\n".join(f"{seconds:.4f}s {sql}" for seconds, sql in stats.sql),
+            )
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Expose the request to core.routers, after a request that may have written
+    the reads of its user stay on the primary for DATABASE_STICKY_SECONDS
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.finish(request)
+        return response
+
+    async def __acall__(self, request):
+        token = current_request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.finish(request)
+        return response
+
+    def finish(self, request):
+        if request.method not in SAFE_METHODS:
+            stick_to_primary(request)
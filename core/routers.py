@@ -0,0 +1,114 @@
+"""
+Send reads of safe requests to replicas and everything else to the primary.
+
+ReplicaRoutingMiddleware keeps the current request in a contextvar. Reads go
+to a random alias of DATABASE_REPLICA_ALIASES only while a GET / HEAD /
+OPTIONS request is served, and its user did not write during the last
+DATABASE_STICKY_SECONDS (read-your-writes). Commands, workers and threads
+outside a request always use the primary.
+
+The view cache follows the same rules (see apps.movies.mixins.CacheMixin):
+sticky requests bypass it and responses read from a replica are not cached
+while the model was written during the last DATABASE_STICKY_SECONDS, the
+delay replicas are expected to catch up within.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import LazyObject, empty
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+current_request = ContextVar("current_request", default=None)
+
+
+def get_user_key(request):
+    """
+    Id of the authenticated user of request, None while it is unknown \n
+    a user still lazy is not evaluated, loading it would query the database
+    from inside the router
+    """
+    user = request.__dict__.get("user")
+    if isinstance(user, LazyObject):
+        user = user._wrapped
+        if user is empty:
+            return None
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def _sticky_key(user_key):
+    return f"db-primary-{user_key}"
+
+
+def stick_to_primary(request):
+    """
+    Send the reads of the user of request to the primary for a while, called
+    after requests that may have written
+    """
+    user_key = get_user_key(request)
+    if user_key is not None:
+        cache.set(_sticky_key(user_key), True, settings.DATABASE_STICKY_SECONDS)
+
+
+def use_primary(request):
+    if request is None or request.method not in SAFE_METHODS:
+        return True
+    # the user becomes known once authenticated, looked up once per request
+    sticky = request.__dict__.get("_db_sticky")
+    if sticky is None:
+        user_key = get_user_key(request)
+        if user_key is None:
+            return False
+        sticky = request._db_sticky = bool(cache.get(_sticky_key(user_key)))
+    return sticky
+
+
+def skips_view_cache():
+    """
+    Whether the current request has to bypass the view cache: its user reads
+    from the primary after a write, responses cached meanwhile may come from
+    a lagging replica
+    """
+    request = current_request.get()
+    return (
+        bool(settings.DATABASE_REPLICA_ALIASES)
+        and request is not None
+        and request.method in SAFE_METHODS
+        and use_primary(request)
+    )
+
+
+def read_from_replica():
+    """
+    Whether the current request read anything from a replica so far
+    """
+    request = current_request.get()
+    return request is not None and request.__dict__.get("_db_replica", False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICA_ALIASES
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        request = current_request.get()
+        if use_primary(request):
+            return DEFAULT_DB_ALIAS
+        request._db_replica = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
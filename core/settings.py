@@ -2,6 +2,7 @@ import os
 import environ
 from pathlib import Path
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.translation import gettext_lazy as _
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ DJANGO_APPS = [
 PROJECT_APPS = [
     "apps.user",
     "apps.movies",
+    "apps.mailer",
 ]
 THIRD_PARTY_APPS = [
     "corsheaders",
@@ -59,6 +61,8 @@ THIRD_PARTY_APPS = [
 INSTALLED_APPS = DJANGO_APPS + PROJECT_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
+    "core.middleware.PerformanceMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -69,6 +73,15 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Requests slower than SLOW_REQUEST_THRESHOLD seconds are logged with their
+# first SLOW_REQUEST_MAX_QUERIES queries by core.middleware, unset to disable.
+# /metrics answers the addresses in METRICS_ALLOWED_IPS, everyone when empty,
+# with the values workers publish every METRICS_PUBLISH_INTERVAL seconds
+SLOW_REQUEST_THRESHOLD = env.float("SLOW_REQUEST_THRESHOLD", default=None)
+SLOW_REQUEST_MAX_QUERIES = 100
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=["127.0.0.1", "::1"])
+METRICS_PUBLISH_INTERVAL = 10
+
 ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
@@ -77,8 +90,18 @@ TEMPLATES = [
         "DIRS": [
             BASE_DIR / "templates",
         ],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # parsed once per process, email templates are precompiled at
+            # startup by apps.mailer
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -94,21 +117,84 @@ ASGI_APPLICATION = "core.asgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# core.sqlite runs SQLITE_PRAGMAS on every new connection: WAL lets readers
+# go on while a worker writes, synchronous=NORMAL only syncs at checkpoints
+# (safe with WAL), writers wait busy_timeout ms for the lock, cache_size is
+# in KiB when negative. Compare profiles with manage.py bench_sqlite
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": env.int("SQLITE_BUSY_TIMEOUT", default=5000),
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "core.sqlite",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {"pragmas": SQLITE_PRAGMAS, "transaction_mode": "IMMEDIATE"},
+        # persistent connections, checked before reuse
+        "CONN_MAX_AGE": env.int("CONN_MAX_AGE", default=600),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Read replicas of the default database, as SQLite paths (e.g. a copy of
+# db.sqlite3 for local tests). core.routers.PrimaryReplicaRouter sends reads of
+# GET / HEAD / OPTIONS requests to them and everything else to default, a user
+# reads from default for DATABASE_STICKY_SECONDS after a write. The sticky flag
+# lives in the default cache
+DATABASE_REPLICA_ALIASES = []
+for index, path in enumerate(env.list("DATABASE_REPLICAS", default=[])):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME": path,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICA_ALIASES.append(alias)
+
+DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+DATABASE_STICKY_SECONDS = 5
+
+# One cache shared by every worker process: view cache generations, sticky
+# reads, throttles and metrics snapshots have to agree between workers. Set
+# CACHE_URL to redis://host:6379/1 (needs the redis package) or
+# pymemcache://host:11211, the default file cache is only shared by the
+# workers of one host. The database cache is refused, on SQLite every miss
+# would take the write lock of the primary. Test modules run on an empty file
+# cache of their own (see core.testing)
+CACHES = {
+    "default": env.cache_url(
+        "CACHE_URL", default=f"filecache://{BASE_DIR / '.cache' / 'django'}"
+    )
+}
+if CACHES["default"]["BACKEND"] == "django.core.cache.backends.db.DatabaseCache":
+    raise ImproperlyConfigured("CACHE_URL can not be a database cache")
+
+# Search backend of list views, SQLite FTS5 falls back to LIKE on other databases
+SEARCH_BACKEND = "apps.movies.search.SQLiteFTSSearchBackend"
+
 # Password validation
 PASSWORD_HASHERS = [
-    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "apps.user.hashers.TunableArgon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
     "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
 ]
 
+# Argon2 costs, measure candidates with manage.py bench_hashers. Changing them
+# rehashes each password on its next login
+ARGON2_TIME_COST = env.int("ARGON2_TIME_COST", default=2)
+ARGON2_MEMORY_COST = env.int("ARGON2_MEMORY_COST", default=102400)
+ARGON2_PARALLELISM = env.int("ARGON2_PARALLELISM", default=8)
+
+# Password checks running at once per process and seconds a login waits for one
+PASSWORD_HASH_CONCURRENCY = env.int("PASSWORD_HASH_CONCURRENCY", default=4)
+PASSWORD_HASH_TIMEOUT = 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -144,12 +230,16 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly"
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.user.authentication.CachedJWTAuthentication",
     ),
 }
 
+# Seconds a user record stays cached by CachedJWTAuthentication, saves and
+# blacklisted tokens evict it before
+JWT_USER_CACHE_TIMEOUT = 300
+
 AUTHENTICATION_BACKENDS = [
-    "django.contrib.auth.backends.ModelBackend",
+    "apps.user.backends.BoundedModelBackend",
 ]
 
 # Rest framework authentications
@@ -160,8 +250,19 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "TOKEN_OBTAIN_SERIALIZER": "apps.user.serializers.BoundedTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "apps.user.blacklist.CachedTokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "apps.user.blacklist.CachedTokenVerifySerializer",
 }
 
+# Blacklist checks read the cache first (see apps.user.blacklist), use a cache
+# shared by every worker in production. Tokens found clean are re-read after
+# JWT_BLACKLIST_NEGATIVE_TIMEOUT seconds. Expired tokens are deleted by
+# manage.py prune_tokens, from cron or every JWT_BLACKLIST_PRUNE_INTERVAL
+# seconds with --loop
+JWT_BLACKLIST_NEGATIVE_TIMEOUT = 60
+JWT_BLACKLIST_PRUNE_INTERVAL = 3600
+
 AUTH_USER_MODEL = "user.UserAccount"
 
 
@@ -194,12 +295,31 @@ DJOSER = {
         "username_changed_confirmation": "email/username_changed_confirmation.html",
         "username_reset": "email/username_reset.html",
     },
+    "EMAIL": {
+        "activation": "apps.mailer.email.ActivationEmail",
+        "confirmation": "apps.mailer.email.ConfirmationEmail",
+        "password_reset": "apps.mailer.email.PasswordResetEmail",
+        "password_changed_confirmation": "apps.mailer.email.PasswordChangedConfirmationEmail",
+        "username_changed_confirmation": "apps.mailer.email.UsernameChangedConfirmationEmail",
+        "username_reset": "apps.mailer.email.UsernameResetEmail",
+    },
 }
 
 FILE_UPLOAD_PERMISSIONS = 0o640
 
 # Mail
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Mails are queued in the database and sent by manage.py send_mail_queue
+# through MAILER_DELIVERY_BACKEND, failures are retried MAILER_MAX_ATTEMPTS
+# times, MAILER_RETRY_DELAY seconds after the first and doubling. Workers claim
+# each batch, a claim expires after MAILER_CLAIM_TIMEOUT seconds
+EMAIL_BACKEND = "apps.mailer.backend.QueuedEmailBackend"
+MAILER_DELIVERY_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+MAILER_BATCH_SIZE = 100
+MAILER_MAX_ATTEMPTS = 5
+MAILER_RETRY_DELAY = 60
+MAILER_CLAIM_TIMEOUT = 300
+# parsed at startup with the DJOSER["TEMPLATES"]
+MAILER_PRECOMPILED_TEMPLATES = ["email/contact.html", "email/newsletter/welcome.html"]
 EMAIL_USE_TLS = False
 EMAIL_USE_SSL = True
 EMAIL_HOST = env("EMAIL_HOST")
@@ -214,3 +334,24 @@ STATIC_ROOT = BASE_DIR / "static"
 PUBLIC_MEDIA_LOCATION = "media"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "static/media"
+
+# How core.media hands files to the front server: "sendfile" streams the open
+# file through wsgi.file_wrapper, "x-accel-redirect" (nginx, internal location
+# at MEDIA_ACCEL_REDIRECT_PREFIX) and "x-sendfile" (Apache) only name it
+MEDIA_SERVE_MODE = env("MEDIA_SERVE_MODE", default="sendfile")
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+MEDIA_CACHE_MAX_AGE = 86400
+
+# Resized copies of uploaded images, built in a thread pool after commit,
+# formats missing from the Pillow build are skipped
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+IMAGE_VARIANT_FORMATS = ("webp", "avif")
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = 2
+IMAGE_VARIANTS_ASYNC = True
+
+# Images sent as base64 inside JSON bodies, larger ones are streamed to disk
+# by the multipart artwork endpoint
+BASE64_IMAGE_MAX_SIZE = 512 * 1024
+ARTWORK_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+ARTWORK_CONTENT_TYPES = ("image/jpeg", "image/png", "image/webp", "image/avif")
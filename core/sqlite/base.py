@@ -0,0 +1,36 @@
+"""
+SQLite backend applying a pragma profile to every new connection.
+
+OPTIONS["pragmas"] maps pragma names to values, run in order right after
+connecting. OPTIONS["transaction_mode"] ("DEFERRED", "IMMEDIATE" or
+"EXCLUSIVE") is used by atomic blocks, IMMEDIATE takes the write lock up
+front so busy_timeout applies instead of failing on lock upgrade. Both
+options are kept out of sqlite3.connect().
+"""
+
+from django.db.backends.sqlite3 import base
+
+BACKEND_OPTIONS = ("pragmas", "transaction_mode")
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for option in BACKEND_OPTIONS:
+            kwargs.pop(option, None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict["OPTIONS"].get("pragmas", {}).items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict["OPTIONS"].get("transaction_mode")
+        if mode is None:
+            return super()._start_transaction_under_autocommit()
+        if mode.upper() not in TRANSACTION_MODES:
+            raise ValueError(f"Unknown SQLite transaction mode {mode!r}")
+        self.cursor().execute(f"BEGIN {mode.upper()}")
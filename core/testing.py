@@ -0,0 +1,29 @@
+"""
+Helpers shared by the test modules of the apps.
+"""
+
+import tempfile
+import unittest
+
+from django.test import override_settings
+
+
+def use_test_cache():
+    """
+    Run the tests of a module on an empty file cache of their own, removed
+    once they are done \n
+    call it from setUpModule, the default cache may hold generations built
+    against another database
+    """
+    directory = tempfile.TemporaryDirectory(prefix="django-test-cache-")
+    cache_settings = override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": directory.name,
+            }
+        }
+    )
+    cache_settings.enable()
+    unittest.addModuleCleanup(directory.cleanup)
+    unittest.addModuleCleanup(cache_settings.disable)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from . import settings
-from django.conf.urls.static import static
+from . import media, metrics
 
 urlpatterns = [
     path("api/auth/", include("djoser.urls")),
@@ -9,4 +9,6 @@ urlpatterns = [
     path("api/auth/", include("djoser.social.urls")),
     path("api/", include("apps.movies.urls")),
     path("admin/", admin.site.urls),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path("metrics", metrics.metrics_view, name="metrics"),
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", media.serve, name="media"),
+]